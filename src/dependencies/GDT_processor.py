@@ -1,34 +1,200 @@
 from databricks import sql
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytz
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import os
-from typing import List, Optional, Tuple, Union
+from typing import Callable, Dict, List, Optional, Tuple, Union
 import logging
+import threading
+from collections import deque
+import time
+
+
+class ConnectionPool:
+    """Thread-safe pool of reusable Databricks SQL connections.
+
+    Idle connections are handed back out on the next acquire instead of paying a
+    fresh connect/auth handshake. Connections idle for longer than ``idle_timeout``
+    seconds, or that report themselves closed, are discarded on checkout. At most
+    ``max_size`` connections exist at once; further acquires wait for a release.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], object],
+        max_size: int = 4,
+        idle_timeout: float = 300.0
+    ):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self._connect = connect
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._idle = []  # list of (connection, released_at), most recently used last
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def _is_alive(connection) -> bool:
+        # databricks-sql-connector exposes ``open``; anything without it is assumed alive
+        return bool(getattr(connection, 'open', True))
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def acquire(self, timeout: Optional[float] = None, fresh: bool = False):
+        """Check out a live connection, creating one if the pool has capacity."""
+        return self.checkout(timeout, fresh)[0]
+
+    def checkout(self, timeout: Optional[float] = None, fresh: bool = False) -> Tuple[object, bool]:
+        """Like ``acquire``, also returning whether the connection was reused from the idle list.
+
+        With ``fresh`` the idle connections are closed and a new one is opened, e.g. after a
+        reused connection turned out to be dead on the server side.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        stale = []
+        with self._cond:
+            if fresh:
+                stale, self._idle = [conn for conn, _ in self._idle], []
+            while True:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed")
+
+                while self._idle:
+                    connection, released_at = self._idle.pop()
+                    if time.monotonic() - released_at > self.idle_timeout or not self._is_alive(connection):
+                        self._close_quietly(connection)
+                        continue
+                    self._in_use += 1
+                    return connection, True
+
+                if self._in_use < self.max_size:
+                    self._in_use += 1
+                    break
+
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"No connection available within {timeout}s (max_size={self.max_size})")
+                self._cond.wait(remaining)
+
+        for connection in stale:
+            self._close_quietly(connection)
+        # Connect outside the lock so a slow handshake does not block releases
+        try:
+            return self._connect(), False
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, connection, discard: bool = False):
+        """Return a connection to the pool, or close it if it is broken or the pool is closed."""
+        with self._cond:
+            self._in_use -= 1
+            if discard or self._closed or not self._is_alive(connection):
+                self._close_quietly(connection)
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._cond.notify()
+
+    def close(self):
+        """Close all idle connections; connections still checked out are closed on release."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for connection, _ in idle:
+            self._close_quietly(connection)
+
 
 class GDTDataManager:
     
+    # Source columns read by _identify_key_metrics; pushed into the SELECT so only these are transferred
+    KEY_METRIC_COLUMNS = [
+        'Timestamp__UTC',
+        'BTC_Spot', 'ETH_Spot',
+        'SOL_BS_Delta',
+        'Alt_Net_Delta', 'Largest_Alt', 'Largest_Alt_Delta',
+        'BTC_BS_Delta_Net', 'BTC_Smile_Gamma', 'BTC_BS_Vega', 'BTC_BS_Theta',
+        'ETH_BS_Delta_Net', 'ETH_Smile_Gamma', 'ETH_BS_Vega', 'ETH_BS_Theta',
+    ]
+    
+    # Parquet metadata key marking a cached close file as holding every column of the table
+    FULL_WIDTH_KEY = b'gdt_full_width'
+    
     def __init__(
         self, 
         server_hostname: str = "gdt-mo.cloud.databricks.com",
         http_path: str = "sql/protocolv1/o/2455603699819334/0227-183543-al5o1v9b",
         access_token: str = None,
         table_name: str = "gc_risk.smile_delta_bm_testing.smile_delta_table_bm_testing",
-        market_close_hour_utc: int = 22
+        market_close_hour_utc: int = 22,
+        pool_size: int = 4,
+        pool_idle_timeout: float = 300.0,
+        cache_dir: Optional[str] = None,
+        close_query_mode: str = "day",
+        close_window_minutes: int = 30,
+        metrics=None,
+        connection_factory: Optional[Callable[[], object]] = None,
+        close_settle_hours: float = 12.0
     ):
         self.server_hostname = server_hostname
         self.http_path = http_path
         self.table_name = table_name
         self.market_close_hour_utc = market_close_hour_utc
         
+        # "day" ranks every row of each date; "window" only scans +/- close_window_minutes
+        # around the close so timestamp-based file pruning applies, widening when a window is empty
+        if close_query_mode not in ("day", "window"):
+            raise ValueError(f"Unknown close_query_mode: {close_query_mode}")
+        self.close_query_mode = close_query_mode
+        self.close_window_minutes = close_window_minutes
+        
+        # Optional on-disk Parquet cache of daily close rows, one file per date
+        self.cache_dir = cache_dir
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        # Hours after a close during which late-landing rows can still change it, so it isn't cached yet
+        self.close_settle_hours = close_settle_hours
+        
         if access_token is None:
             self.access_token = os.getenv("DATABRICKS_PAT")
-            if self.access_token is None:
+            if self.access_token is None and connection_factory is None:
                 raise ValueError("Databricks access token not provided and not found in environment")
         else:
             self.access_token = access_token
             
         self.logger = logging.getLogger(__name__)
+        self._table_columns = None
+        # Statement ids of recent queries, used to look up scan metrics when benchmarking
+        self._recent_query_ids = deque(maxlen=64)
+        # connection_factory replaces the live warehouse, e.g. with a replay.ReplayConnection
+        self._connect = connection_factory or self._get_connection
+        self.pool = ConnectionPool(self._connect, max_size=pool_size, idle_timeout=pool_idle_timeout)
+        # Per-thread pool override, so a benchmark's session settings stay on its own connections
+        self._local = threading.local()
+        # Optional RequestMetrics; each query is recorded under the client name "gdt"
+        self.metrics = metrics
+        
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def close(self):
+        """Close all pooled Databricks connections"""
+        self.pool.close()
         
     def _get_connection(self):
         return sql.connect(
@@ -37,115 +203,172 @@ class GDTDataManager:
             access_token=self.access_token
         )
     
-    def _identify_key_metrics(self, df: pd.DataFrame) -> dict:
-        """Identify and extract only the key metrics we care about"""
+    # Source column -> key metric name, in the order metrics are reported
+    KEY_METRIC_MAPPING = {
+        'BTC_Spot': 'BTC_Spot',
+        'ETH_Spot': 'ETH_Spot',
+        'SOL_BS_Delta': 'SOL_Delta',
+        'Alt_Net_Delta': 'Alt_Delta',
+        'Largest_Alt': 'Largest_Alt',
+        'Largest_Alt_Delta': 'Largest_Alt_Delta',
+        'BTC_BS_Delta_Net': 'BTC_Delta',
+        'BTC_Smile_Gamma': 'BTC_Gamma',
+        'BTC_BS_Vega': 'BTC_Vega',
+        'BTC_BS_Theta': 'BTC_Theta',
+        'ETH_BS_Delta_Net': 'ETH_Delta',
+        'ETH_Smile_Gamma': 'ETH_Gamma',
+        'ETH_BS_Vega': 'ETH_Vega',
+        'ETH_BS_Theta': 'ETH_Theta',
+    }
+    
+    def _key_metrics_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Extract the key metrics for every close row in df as columns of a DataFrame
+        indexed by close date, including the Total_* roll-ups.
+        """
         if df.empty:
-            return {}
+            return pd.DataFrame()
             
-        # Based on the available columns, focus on the specific asset classes and Greeks
-        key_metrics = {}
+        source_columns = [col for col in self.KEY_METRIC_MAPPING if col in df.columns]
+        # The largest alt name is only meaningful alongside its delta
+        if not {'Largest_Alt', 'Largest_Alt_Delta'} <= set(df.columns):
+            source_columns = [col for col in source_columns if col not in ('Largest_Alt', 'Largest_Alt_Delta')]
+            
+        metrics = df[source_columns].rename(columns=self.KEY_METRIC_MAPPING).reset_index(drop=True)
         
-        # Capture timestamp first
         if 'Timestamp__UTC' in df.columns:
-            utc_time = df['Timestamp__UTC'].iloc[0]
-            est_time = utc_time.astimezone(pytz.timezone('US/Eastern'))
-            key_metrics['Timestamp_EST'] = est_time
-        
-        # Spot prices
-        spot_metrics = ['BTC_Spot', 'ETH_Spot']
-        for col in spot_metrics:
-            if col in df.columns:
-                key_metrics[col] = df[col].iloc[0]
-        
-        # SOL data
-        if 'SOL_BS_Delta' in df.columns:
-            key_metrics['SOL_Delta'] = df['SOL_BS_Delta'].iloc[0]
-        
-        # Alt data  
-        if 'Alt_Net_Delta' in df.columns:
-            key_metrics['Alt_Delta'] = df['Alt_Net_Delta'].iloc[0]
-        
-        if 'Largest_Alt' in df.columns and 'Largest_Alt_Delta' in df.columns:
-            key_metrics['Largest_Alt'] = df['Largest_Alt'].iloc[0]
-            key_metrics['Largest_Alt_Delta'] = df['Largest_Alt_Delta'].iloc[0]
-        
-        # BTC Greeks
-        btc_greek_mapping = {
-            'Delta': 'BTC_BS_Delta_Net',
-            'Gamma': 'BTC_Smile_Gamma',
-            'Vega': 'BTC_BS_Vega',
-            'Theta': 'BTC_BS_Theta'
-        }
-        
-        for greek, column in btc_greek_mapping.items():
-            if column in df.columns:
-                key_metrics[f'BTC_{greek}'] = df[column].iloc[0]
-        
-        # ETH Greeks
-        eth_greek_mapping = {
-            'Delta': 'ETH_BS_Delta_Net',
-            'Gamma': 'ETH_Smile_Gamma',
-            'Vega': 'ETH_BS_Vega',
-            'Theta': 'ETH_BS_Theta'
-        }
-        
-        for greek, column in eth_greek_mapping.items():
-            if column in df.columns:
-                key_metrics[f'ETH_{greek}'] = df[column].iloc[0]
-                
-        # Calculate total Delta, Gamma, Vega, Theta across assets
-        # Start with BTC and ETH values
-        total_delta = key_metrics.get('BTC_Delta', 0) + key_metrics.get('ETH_Delta', 0)
-        total_gamma = key_metrics.get('BTC_Gamma', 0) + key_metrics.get('ETH_Gamma', 0)
-        total_vega = key_metrics.get('BTC_Vega', 0) + key_metrics.get('ETH_Vega', 0)
-        total_theta = key_metrics.get('BTC_Theta', 0) + key_metrics.get('ETH_Theta', 0)
-        
-        # Add SOL and Alt deltas if available
-        if 'SOL_Delta' in key_metrics:
-            total_delta += key_metrics['SOL_Delta']
-        
-        if 'Alt_Delta' in key_metrics:
-            total_delta += key_metrics['Alt_Delta']
-        
-        # Add totals to key metrics
-        key_metrics['Total_Delta'] = total_delta
-        key_metrics['Total_Gamma'] = total_gamma
-        key_metrics['Total_Vega'] = total_vega
-        key_metrics['Total_Theta'] = total_theta
+            # Naive timestamps are UTC; utc=True localizes them instead of failing in tz_convert
+            utc_time = pd.to_datetime(df['Timestamp__UTC'], utc=True).reset_index(drop=True)
+            metrics.insert(0, 'Timestamp_EST', utc_time.dt.tz_convert('US/Eastern'))
+            # Indexed like the close query partitions, by DATE(Timestamp__UTC): one row per date even
+            # when a close lands before US/Eastern midnight and shares its Eastern date with the previous one
+            metrics.index = pd.DatetimeIndex(utc_time.dt.tz_convert(None).dt.normalize(), name='Date')
+            
+        # Missing greeks count as zero, as in the single-close totals
+        for greek, extra in (('Delta', ['SOL_Delta', 'Alt_Delta']), ('Gamma', []), ('Vega', []), ('Theta', [])):
+            total = 0
+            for col in [f'BTC_{greek}', f'ETH_{greek}'] + extra:
+                if col in metrics.columns:
+                    total = total + metrics[col]
+            metrics[f'Total_{greek}'] = total
             
-        return key_metrics
+        return metrics
+    
+    def _identify_key_metrics(self, df: pd.DataFrame) -> dict:
+        """Identify and extract only the key metrics we care about"""
+        metrics = self._key_metrics_frame(df.iloc[:1])
+        if metrics.empty:
+            return {}
+        return {col: metrics[col].iloc[0] for col in metrics.columns}
+    
+    def _with_wow_changes(self, metrics: pd.DataFrame) -> pd.DataFrame:
+        """Add {metric}_pct_change columns comparing each close with the close 7 days earlier"""
+        numeric = metrics.select_dtypes('number')
+        week_ago = numeric.shift(freq='7D').reindex(metrics.index)
+        pct_change = (numeric - week_ago) / week_ago.abs().where(week_ago != 0) * 100
+        return pd.concat([metrics, pct_change.add_suffix('_pct_change')], axis=1)
     
-    def _execute_query(self, query: str) -> pd.DataFrame:
+    @staticmethod
+    def _is_connection_error(error: Exception) -> bool:
+        """Transport and session failures, as opposed to errors the server reports for the SQL itself"""
+        return isinstance(error, (OSError, sql.OperationalError, sql.InterfaceError))
+    
+    def _execute_query(self, query: str, operation: str = "query", log_level: int = logging.ERROR) -> pd.DataFrame:
+        # The client-side ``open`` flag can't tell that the server expired a pooled session,
+        # so a query that loses its reused connection is retried once on a new one
+        df, error, reused = self._execute_query_once(query, operation)
+        if error is not None and reused and self._is_connection_error(error):
+            self.logger.info(f"Retrying {operation} query on a new connection")
+            df, error, _ = self._execute_query_once(query, operation, fresh=True)
+        if error is not None:
+            self.logger.log(log_level, f"Error executing query: {error}")
+        return df
+    
+    def _execute_query_once(self, query: str, operation: str, fresh: bool = False) -> Tuple[pd.DataFrame, Optional[Exception], bool]:
+        """Run a query on a pooled connection; returns the result, any error, and whether the connection was reused"""
         connection = None
+        reused = False
+        error = None
+        table = None
+        start = time.perf_counter()
         try:
-            connection = self._get_connection()
+            pool = getattr(self._local, 'pool', None) or self.pool
+            connection, reused = pool.checkout(fresh=fresh)
             with connection.cursor() as cursor:
                 cursor.execute(query)
-                result = cursor.fetchall()
-                columns = [desc[0] for desc in cursor.description]
-                df = pd.DataFrame(result, columns=columns)
-                return df
+                self._recent_query_ids.append(getattr(cursor, 'query_id', None))
+                # Arrow batches convert to pandas column-wise, without per-row Python objects
+                table = cursor.fetchall_arrow()
+                return table.to_pandas(), None, reused
                 
         except Exception as e:
-            self.logger.error(f"Error executing query: {e}")
-            return pd.DataFrame()
+            error = e
+            return pd.DataFrame(), e, reused
         finally:
             if connection:
-                connection.close()
+                # Don't hand a connection that just failed to the next query; one that only
+                # rejected the SQL (e.g. an unknown column) is still good
+                pool.release(connection, discard=error is not None and self._is_connection_error(error))
+            if self.metrics is not None:
+                self.metrics.record(
+                    'gdt', operation, time.perf_counter() - start,
+                    bytes=table.nbytes if table is not None else 0,
+                    rows=table.num_rows if table is not None else None,
+                    error=error
+                )
     
-    def get_market_close_data(self, date: Union[str, datetime]) -> pd.DataFrame:
-        if isinstance(date, str):
-            date = datetime.strptime(date, '%Y-%m-%d').date()
-        elif isinstance(date, datetime):
-            date = date.date()
+    @staticmethod
+    def _parse_date(value: Union[str, datetime, date]) -> date:
+        if isinstance(value, str):
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        if isinstance(value, datetime):
+            return value.date()
+        return value
+    
+    def _get_table_columns(self) -> Optional[List[str]]:
+        """Column names of the source table, looked up once per manager"""
+        if self._table_columns is None:
+            df = self._execute_query(f"SELECT * FROM {self.table_name} LIMIT 0", "table_columns")
+            if len(df.columns):
+                self._table_columns = df.columns.tolist()
+        return self._table_columns
+    
+    def _select_list(self, columns: Optional[List[str]]) -> str:
+        if columns is None:
+            return '*'
             
-        date_str = date.strftime('%Y-%m-%d')
+        wanted = ['Timestamp__UTC'] + [c for c in columns if c != 'Timestamp__UTC']
+        # Once the table's columns are known, unknown names are dropped instead of failing the query
+        if self._table_columns is not None:
+            wanted = [c for c in wanted if c in self._table_columns]
+        return ', '.join(f"`{c}`" for c in wanted)
+    
+    def _execute_close_query(self, date_filter: str, columns: Optional[List[str]], operation: str) -> pd.DataFrame:
+        """Run a close query, learning the table's columns from full-width results.
         
-        query = f"""
+        A projected query that fails before the columns are known is retried once with
+        the projection filtered against the table, in case a requested column doesn't exist.
+        """
+        # Expected to fail when a requested column doesn't exist, so that isn't logged as an error
+        may_retry = columns is not None and self._table_columns is None
+        df = self._execute_query(
+            self._build_close_query(date_filter, columns), operation, logging.INFO if may_retry else logging.ERROR
+        )
+        if 'Timestamp__UTC' in df.columns:
+            if columns is None and self._table_columns is None:
+                self._table_columns = [c for c in df.columns if c != 'RowRank']
+        elif may_retry and self._get_table_columns() is not None:
+            df = self._execute_query(self._build_close_query(date_filter, columns), operation)
+        return df
+    
+    def _build_close_query(self, date_filter: str, columns: Optional[List[str]] = None) -> str:
+        """Window query returning the row closest to market close for each day matching date_filter"""
+        return f"""
         WITH DailyCloseData AS (
             SELECT
-                *,
+                {self._select_list(columns)},
                 ROW_NUMBER() OVER (
+                    PARTITION BY DATE(Timestamp__UTC)
                     ORDER BY ABS(
                         EXTRACT(HOUR FROM Timestamp__UTC) * 3600 +
                         EXTRACT(MINUTE FROM Timestamp__UTC) * 60 +
@@ -154,25 +377,190 @@ class GDTDataManager:
                     ) ASC
                 ) AS RowRank
             FROM {self.table_name}
-            WHERE DATE(Timestamp__UTC) = '{date_str}'
+            WHERE {date_filter}
         )
         SELECT *
         FROM DailyCloseData
-        WHERE RowRank = 1;
+        WHERE RowRank = 1
+        ORDER BY Timestamp__UTC;
         """
+    
+    def _close_window_filter(self, close_dates: List[date], window_minutes: int) -> str:
+        """Timestamp range predicate around each date's close, clamped to that date"""
+        ranges = []
+        for d in close_dates:
+            day_start = datetime.combine(d, datetime.min.time())
+            close_time = day_start + timedelta(hours=self.market_close_hour_utc)
+            lower = max(day_start, close_time - timedelta(minutes=window_minutes))
+            upper = min(day_start + timedelta(days=1), close_time + timedelta(minutes=window_minutes))
+            ranges.append(
+                f"(Timestamp__UTC >= TIMESTAMP '{lower:%Y-%m-%d %H:%M:%S}' "
+                f"AND Timestamp__UTC < TIMESTAMP '{upper:%Y-%m-%d %H:%M:%S}')"
+            )
+        return "(" + " OR ".join(ranges) + ")"
+    
+    def _split_by_close_date(self, df: pd.DataFrame, close_dates: List[date]) -> Dict[date, pd.DataFrame]:
+        row_dates = pd.to_datetime(df['Timestamp__UTC']).dt.date
+        return {
+            d: df[row_dates == d].reset_index(drop=True)
+            for d in close_dates
+        }
+    
+    def _query_market_close_batch(
+        self,
+        close_dates: List[date],
+        columns: Optional[List[str]] = None,
+        mode: Optional[str] = None
+    ) -> Optional[Dict[date, pd.DataFrame]]:
+        """Query Databricks for the given close dates. Returns None if the query failed."""
+        mode = mode or self.close_query_mode
         
-        return self._execute_query(query)
+        if mode == "day":
+            date_list = ", ".join(f"'{d.strftime('%Y-%m-%d')}'" for d in close_dates)
+            df = self._execute_close_query(f"DATE(Timestamp__UTC) IN ({date_list})", columns, "close_day")
+            
+            # _execute_query swallows errors and returns a frame without columns
+            if 'Timestamp__UTC' not in df.columns:
+                return None
+            return self._split_by_close_date(df, close_dates)
+            
+        # Any row inside a non-empty window is closer to the close than every row outside it,
+        # so the nearest row in the window is the same row the full-day ranking picks
+        result = {}
+        remaining = list(close_dates)
+        window_minutes = self.close_window_minutes
+        while remaining:
+            df = self._execute_close_query(
+                self._close_window_filter(remaining, window_minutes), columns, "close_window"
+            )
+            if 'Timestamp__UTC' not in df.columns:
+                return None
+                
+            found = self._split_by_close_date(df, remaining)
+            result.update({d: rows for d, rows in found.items() if not rows.empty})
+            
+            # Once the window covers the whole day an empty result is final
+            if window_minutes >= 24 * 60:
+                result.update(found)
+                break
+            remaining = [d for d in remaining if d not in result]
+            if remaining:
+                self.logger.info(f"No rows within {window_minutes} minutes of close for {remaining}, widening window")
+            window_minutes *= 4
+            
+        return result
+    
+    def _is_mutable_close(self, close_date: date) -> bool:
+        # A close can still move until its day is over and late rows have had time to land
+        settled_at = datetime.combine(close_date + timedelta(days=1), datetime.min.time(), tzinfo=pytz.UTC)
+        return datetime.now(pytz.UTC) < settled_at + timedelta(hours=self.close_settle_hours)
     
-    def get_latest_market_close(self) -> Tuple[pd.DataFrame, datetime]:
+    def _cache_path(self, close_date: date) -> str:
+        return os.path.join(self.cache_dir, f"close_{close_date.strftime('%Y-%m-%d')}.parquet")
+    
+    def _read_cached_close(self, close_date: date) -> Tuple[Optional[pd.DataFrame], bool]:
+        """Cached close rows and whether they hold the table's full width (not a projection)"""
+        path = self._cache_path(close_date)
+        if not os.path.exists(path):
+            return None, False
+        try:
+            table = pq.read_table(path)
+        except Exception as e:
+            self.logger.warning(f"Ignoring unreadable cache file {path}: {e}")
+            return None, False
+        # Files written before the flag existed are treated as projections
+        full_width = (table.schema.metadata or {}).get(self.FULL_WIDTH_KEY) == b'1'
+        return table.to_pandas(), full_width
+    
+    def _write_cached_close(self, close_date: date, df: pd.DataFrame, full_width: bool):
+        # A zero-row file records that the warehouse has no close for that day
+        path = self._cache_path(close_date)
+        
+        # Keep columns cached by earlier, differently projected fetches of the same close row
+        existing, existing_full_width = self._read_cached_close(close_date)
+        if existing is not None and len(existing) == len(df) and (
+            df.empty or existing['Timestamp__UTC'].equals(df['Timestamp__UTC'])
+        ):
+            extra = [c for c in existing.columns if c not in df.columns]
+            df = pd.concat([df.reset_index(drop=True), existing[extra]], axis=1)
+            full_width = full_width or existing_full_width
+            
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}), self.FULL_WIDTH_KEY: b'1' if full_width else b'0'
+        })
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            pq.write_table(table, tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            self.logger.warning(f"Could not write cache file {path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    def get_market_close_batch(
+        self,
+        dates: List[Union[str, datetime, date]],
+        columns: Optional[List[str]] = None
+    ) -> Dict[date, pd.DataFrame]:
+        """
+        Get the market close row for every requested date in a single query.
+        Returns a dictionary keyed by date; dates without data map to an empty DataFrame.
+        When a cache directory is configured, past closes are served from disk and only
+        missing or still-mutable dates (up to close_settle_hours after the day ends) are queried. Pass columns to select only those
+        (plus Timestamp__UTC) instead of the full table width.
+        """
+        close_dates = sorted({self._parse_date(d) for d in dates})
+        if not close_dates:
+            return {}
+            
+        result = {}
+        if self.cache_dir:
+            for d in close_dates:
+                if not self._is_mutable_close(d):
+                    cached, full_width = self._read_cached_close(d)
+                    if cached is None:
+                        continue
+                    if columns is None:
+                        # A projected file can't answer a full-width request unless the day had no close
+                        if full_width or cached.empty:
+                            result[d] = cached
+                    elif set(columns) <= set(cached.columns):
+                        keep = ['Timestamp__UTC'] + [c for c in columns if c != 'Timestamp__UTC'] + ['RowRank']
+                        result[d] = cached[[c for c in keep if c in cached.columns]]
+                        
+        to_query = [d for d in close_dates if d not in result]
+        if to_query:
+            queried = self._query_market_close_batch(to_query, columns)
+            if queried is None:
+                queried = {d: pd.DataFrame() for d in to_query}
+            elif self.cache_dir:
+                for d, df in queried.items():
+                    if not self._is_mutable_close(d):
+                        self._write_cached_close(d, df, full_width=columns is None)
+            result.update(queried)
+            
+        return {d: result[d] for d in close_dates}
+    
+    def get_market_close_data(
+        self,
+        date: Union[str, datetime],
+        columns: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        date = self._parse_date(date)
+        return self.get_market_close_batch([date], columns)[date]
+    
+    def _latest_close_date(self) -> date:
         now = datetime.now(pytz.timezone('US/Eastern'))
         target_hour = 17
         
         if now.hour < target_hour:
-            target_date = (now - timedelta(days=1)).date()
-        else:
-            target_date = now.date()
-            
-        df = self.get_market_close_data(target_date)
+            return (now - timedelta(days=1)).date()
+        return now.date()
+    
+    def get_latest_market_close(self, columns: Optional[List[str]] = None) -> Tuple[pd.DataFrame, datetime]:
+        target_date = self._latest_close_date()
+        df = self.get_market_close_data(target_date, columns)
         return df, target_date
     
     def get_weekly_comparison(self) -> dict:
@@ -180,10 +568,13 @@ class GDTDataManager:
         Get market close data for the most recent close and exactly one week prior.
         Returns a dictionary with metrics for both dates and percentage changes.
         """
-        recent_df, recent_date = self.get_latest_market_close()
-        
+        recent_date = self._latest_close_date()
         week_ago_date = recent_date - timedelta(days=7)
-        week_ago_df = self.get_market_close_data(week_ago_date)
+        
+        # Both closes come back from one round trip
+        close_data = self.get_market_close_batch([recent_date, week_ago_date], self.KEY_METRIC_COLUMNS)
+        recent_df = close_data[recent_date]
+        week_ago_df = close_data[week_ago_date]
         
         # Get key metrics for each date
         recent_metrics = self._identify_key_metrics(recent_df)
@@ -216,7 +607,8 @@ class GDTDataManager:
     def get_date_range_data(
         self, 
         start_date: Union[str, datetime], 
-        end_date: Union[str, datetime] = None
+        end_date: Union[str, datetime] = None,
+        columns: Optional[List[str]] = None
     ) -> pd.DataFrame:
         if isinstance(start_date, str):
             start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
@@ -230,32 +622,53 @@ class GDTDataManager:
         elif isinstance(end_date, datetime):
             end_date = end_date.date()
             
+        if self.cache_dir or self.close_query_mode == "window":
+            close_dates = pd.date_range(start_date, end_date, freq='D').date
+            frames = [df for df in self.get_market_close_batch(close_dates, columns).values() if not df.empty]
+            if not frames:
+                return pd.DataFrame()
+            return pd.concat(frames, ignore_index=True).sort_values('Timestamp__UTC', ignore_index=True)
+            
         start_date_str = start_date.strftime('%Y-%m-%d')
         end_date_str = end_date.strftime('%Y-%m-%d')
         
-        query = f"""
-        WITH DailyCloseData AS (
-            SELECT
-                *,
-                ROW_NUMBER() OVER (
-                    PARTITION BY DATE(Timestamp__UTC)
-                    ORDER BY ABS(
-                        EXTRACT(HOUR FROM Timestamp__UTC) * 3600 +
-                        EXTRACT(MINUTE FROM Timestamp__UTC) * 60 +
-                        EXTRACT(SECOND FROM Timestamp__UTC) -
-                        {self.market_close_hour_utc} * 3600
-                    ) ASC
-                ) AS RowRank
-            FROM {self.table_name}
-            WHERE DATE(Timestamp__UTC) BETWEEN '{start_date_str}' AND '{end_date_str}'
+        return self._execute_close_query(
+            f"DATE(Timestamp__UTC) BETWEEN '{start_date_str}' AND '{end_date_str}'",
+            columns,
+            "date_range"
         )
-        SELECT *
-        FROM DailyCloseData
-        WHERE RowRank = 1
-        ORDER BY Timestamp__UTC;
+    
+    def get_metric_frame(
+        self,
+        metrics: List[str],
+        start_date: Union[str, datetime] = None,
+        end_date: Union[str, datetime] = None,
+        resample: Optional[str] = None
+    ) -> pd.DataFrame:
+        """
+        Get several metrics as columns of one US/Eastern-indexed DataFrame from a single fetch.
+        resample takes a pandas offset alias (e.g. 'W-FRI', 'ME') and keeps the last close in each period.
         """
+        if start_date is None:
+            start_date = (datetime.now() - timedelta(days=30)).date()
+            
+        df = self.get_date_range_data(start_date, end_date, columns=metrics)
         
-        return self._execute_query(query)
+        if df.empty:
+            return pd.DataFrame(columns=metrics)
+            
+        missing = [metric for metric in metrics if metric not in df.columns]
+        if missing:
+            available = self._table_columns or df.columns.tolist()
+            self.logger.error(f"Metrics {missing} not found in data. Available columns: {available}")
+            
+        dates = pd.to_datetime(df['Timestamp__UTC'], utc=True).dt.tz_convert('US/Eastern')
+        frame = df[[metric for metric in metrics if metric in df.columns]].set_index(pd.DatetimeIndex(dates))
+        
+        if resample:
+            frame = frame.resample(resample).last().dropna(how='all')
+            
+        return frame
     
     def get_metric_series(
         self, 
@@ -264,31 +677,21 @@ class GDTDataManager:
         end_date: Union[str, datetime] = None
     ) -> pd.Series:
         """Get a time series for any specific metric"""
-        if start_date is None:
-            start_date = (datetime.now() - timedelta(days=30)).date()
-            
-        df = self.get_date_range_data(start_date, end_date)
+        frame = self.get_metric_frame([metric_name], start_date, end_date)
         
-        if df.empty:
-            return pd.Series()
-            
-        if metric_name not in df.columns:
-            self.logger.error(f"Metric '{metric_name}' not found in data. Available columns: {df.columns.tolist()}")
+        if metric_name not in frame.columns or frame.empty:
             return pd.Series()
             
-        dates = pd.to_datetime(df['Timestamp__UTC']).dt.tz_convert('US/Eastern')
-        metric_values = df[metric_name]
-        
-        return pd.Series(metric_values.values, index=dates)
+        return pd.Series(frame[metric_name].values, index=frame.index)
     
     def get_risk_metrics(
         self, 
         date: Union[str, datetime, None] = None
     ) -> dict:
         if date is None:
-            df, _ = self.get_latest_market_close()
+            df, _ = self.get_latest_market_close(self.KEY_METRIC_COLUMNS)
         else:
-            df = self.get_market_close_data(date)
+            df = self.get_market_close_data(date, self.KEY_METRIC_COLUMNS)
             
         if df.empty:
             return {}
@@ -297,4 +700,126 @@ class GDTDataManager:
         df = df.drop(columns=['RowRank'], errors='ignore')
         
         # Get key metrics using the helper function
-        return self._identify_key_metrics(df)
\ No newline at end of file
+        return self._identify_key_metrics(df)
+    
+    def _get_query_metrics(self, query_id: str) -> dict:
+        """Look up scan metrics for a finished statement in the Databricks query history"""
+        import requests
+        
+        try:
+            response = requests.get(
+                f"https://{self.server_hostname}/api/2.0/sql/history/queries",
+                headers={'Authorization': f"Bearer {self.access_token}"},
+                params={'filter_by.statement_ids': query_id, 'include_metrics': 'true'},
+                timeout=30
+            )
+            response.raise_for_status()
+            history = response.json().get('res', [])
+        except Exception as e:
+            self.logger.warning(f"Could not fetch metrics for query {query_id}: {e}")
+            return {}
+            
+        if not history:
+            return {}
+        metrics = history[0].get('metrics', {})
+        return {
+            'read_bytes': metrics.get('read_bytes'),
+            'read_files_count': metrics.get('read_files_count'),
+            'pruned_files_count': metrics.get('pruned_files_count'),
+        }
+    
+    def _uncached_connection(self):
+        """A new connection with the warehouse result cache disabled for its session"""
+        connection = self._connect()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SET use_cached_result = false")
+                cursor.fetchall_arrow()
+        except Exception:
+            ConnectionPool._close_quietly(connection)
+            raise
+        return connection
+    
+    def benchmark_close_queries(
+        self,
+        dates: List[Union[str, datetime, date]],
+        columns: Optional[List[str]] = None,
+        repeats: int = 3,
+        include_scan_metrics: bool = True
+    ) -> pd.DataFrame:
+        """
+        Compare the full-day and windowed close queries for the same dates.
+        Bypasses the local cache and disables the warehouse result cache, then returns one
+        row per run with latency, rows returned, queries issued and (optionally) bytes scanned
+        and files pruned as reported by the query history API.
+        """
+        close_dates = sorted({self._parse_date(d) for d in dates})
+        
+        # The setting lasts for the session, so the benchmark runs on its own connection rather than
+        # leaving the result cache disabled on one the shared pool hands out later
+        benchmark_pool = ConnectionPool(self._uncached_connection, max_size=1)
+        self._local.pool = benchmark_pool
+        try:
+            return self._run_close_benchmark(close_dates, columns, repeats, include_scan_metrics)
+        finally:
+            del self._local.pool
+            benchmark_pool.close()
+    
+    def _run_close_benchmark(
+        self,
+        close_dates: List[date],
+        columns: Optional[List[str]],
+        repeats: int,
+        include_scan_metrics: bool
+    ) -> pd.DataFrame:
+        records = []
+        for run in range(repeats):
+            for mode in ("day", "window"):
+                query_ids_before = list(self._recent_query_ids)
+                start = time.perf_counter()
+                queried = self._query_market_close_batch(close_dates, columns, mode=mode)
+                elapsed = time.perf_counter() - start
+                query_ids = [q for q in self._recent_query_ids if q not in query_ids_before]
+                
+                record = {
+                    'mode': mode,
+                    'run': run,
+                    'seconds': elapsed,
+                    'rows': sum(len(df) for df in queried.values()) if queried else 0,
+                    'queries': len(query_ids),
+                }
+                if include_scan_metrics:
+                    scans = [self._get_query_metrics(q) for q in query_ids if q]
+                    for key in ('read_bytes', 'read_files_count', 'pruned_files_count'):
+                        values = [scan[key] for scan in scans if scan.get(key) is not None]
+                        record[key] = sum(values) if values else None
+                records.append(record)
+                
+        return pd.DataFrame(records)
+    
+    def get_key_metrics_history(
+        self,
+        start_date: Union[str, datetime] = None,
+        end_date: Union[str, datetime] = None,
+        include_wow: bool = True
+    ) -> pd.DataFrame:
+        """
+        Get the key metrics for every market close in a date range as a date-indexed DataFrame.
+        With include_wow, {metric}_pct_change columns hold the change against the close a week earlier.
+        """
+        if start_date is None:
+            start_date = (datetime.now() - timedelta(days=30)).date()
+        start_date = self._parse_date(start_date)
+        
+        # Fetch an extra week so the first dates in range have a comparison point
+        fetch_start = start_date - timedelta(days=7) if include_wow else start_date
+        df = self.get_date_range_data(fetch_start, end_date, columns=self.KEY_METRIC_COLUMNS)
+        
+        metrics = self._key_metrics_frame(df)
+        if metrics.empty or not isinstance(metrics.index, pd.DatetimeIndex):
+            return metrics
+            
+        if include_wow:
+            metrics = self._with_wow_changes(metrics)
+            
+        return metrics[metrics.index >= pd.Timestamp(start_date)]
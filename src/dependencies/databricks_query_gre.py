@@ -1,17 +1,32 @@
 from databricks import sql
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from dotenv import load_dotenv
 import os
-from datetime import datetime
-from typing import Optional
+import time
+from datetime import date, datetime
+from typing import Callable, Dict, Iterable, Iterator, Optional, Union
 
 class DatabricksGREQuery:
-    def __init__(self):
-        """Initialize DatabricksGREQuery with connection parameters from environment."""
+    GRE_TABLE = "gc_accounting.finance_uat.dt_gre_pnl_snapshot"
+
+    def __init__(self, metrics=None, connection_factory: Optional[Callable[[], object]] = None):
+        """
+        Initialize DatabricksGREQuery with connection parameters from environment.
+        
+        Args:
+            metrics (RequestMetrics, optional): Records each query's latency, rows and bytes under the client name "gre"
+            connection_factory (callable, optional): Returns connections to use instead of the live warehouse,
+                e.g. replay.replay_connection_factory(store)
+        """
         load_dotenv()
+        self.metrics = metrics
+        self.connection_factory = connection_factory
         
         self.databricks_pat = os.getenv("DATABRICKS_PAT")
-        if not self.databricks_pat:
+        if not self.databricks_pat and connection_factory is None:
             raise ValueError("DATABRICKS_PAT not found in environment variables")
             
         self.server_hostname = "gdt-mo.cloud.databricks.com"
@@ -19,11 +34,93 @@ class DatabricksGREQuery:
         
     def get_connection(self):
         """Create and return a new Databricks SQL connection."""
+        if self.connection_factory is not None:
+            return self.connection_factory()
         return sql.connect(
             server_hostname=self.server_hostname,
             http_path=self.http_path,
             access_token=self.databricks_pat
         )
+
+    def _iter_query_batches(
+        self,
+        query: str,
+        batch_rows: int,
+        max_batch_bytes: int,
+        operation: str = "query",
+        keep_schema: bool = False
+    ) -> Iterator[pa.Table]:
+        """
+        Execute a query and yield its result as Arrow tables of bounded size.
+
+        A small first batch measures the row width; later batches grow up to batch_rows
+        but are capped so that no single batch holds more than roughly max_batch_bytes.
+        With keep_schema, a query returning no rows yields one empty table carrying the result schema.
+        """
+        start = time.perf_counter()
+        total_rows = total_bytes = 0
+        error = None
+        connection = self.get_connection()
+        cursor = connection.cursor()
+        
+        try:
+            cursor.execute(query)
+            rows = min(batch_rows, 1000)
+            while True:
+                batch = cursor.fetchmany_arrow(rows)
+                if batch.num_rows == 0:
+                    if keep_schema and total_rows == 0:
+                        yield batch
+                    break
+                total_rows += batch.num_rows
+                total_bytes += batch.nbytes
+                yield batch
+                
+                bytes_per_row = max(1, batch.nbytes // batch.num_rows)
+                rows = max(1, min(batch_rows, max_batch_bytes // bytes_per_row))
+                
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+            # Timing includes the caller's work between batches, i.e. the whole stream's wall time
+            if self.metrics is not None:
+                self.metrics.record(
+                    'gre', operation, time.perf_counter() - start,
+                    bytes=total_bytes, rows=total_rows, error=error
+                )
+
+    def iter_gre_positions(
+        self,
+        trading_day: str,
+        batch_rows: int = 50_000,
+        max_batch_bytes: int = 64 * 1024 * 1024,
+        as_arrow: bool = False,
+        keep_schema: bool = False
+    ) -> Iterator[Union[pd.DataFrame, pa.Table]]:
+        """
+        Stream GRE position data for a specific trading day in bounded-size batches.
+        
+        Args:
+            trading_day (str): Date in 'YYYY-MM-DD' format
+            batch_rows (int): Upper bound on rows per batch
+            max_batch_bytes (int): Approximate memory ceiling per batch, in bytes
+            as_arrow (bool): Yield pyarrow Tables instead of DataFrames
+            keep_schema (bool): For a day without positions, yield one empty batch with the table's columns
+            
+        Yields:
+            pd.DataFrame or pa.Table: Consecutive batches of GRE positions, with no row cap
+        """
+        query = f"""
+        SELECT *
+        FROM {self.GRE_TABLE}
+        WHERE TRADING_DAY = '{trading_day}'
+        """
+        
+        for batch in self._iter_query_batches(query, batch_rows, max_batch_bytes, "gre_positions", keep_schema):
+            yield batch if as_arrow else batch.to_pandas()
         
     def get_gre_positions(self, trading_day: str) -> pd.DataFrame:
         """
@@ -35,32 +132,117 @@ class DatabricksGREQuery:
         Returns:
             pd.DataFrame: DataFrame containing GRE positions for the specified date
         """
-        connection = self.get_connection()
-        cursor = connection.cursor()
+        # An empty day still comes back with the table's columns
+        batches = list(self.iter_gre_positions(trading_day, as_arrow=True, keep_schema=True))
+        if batches:
+            df = pa.concat_tables(batches).to_pandas()
+        else:
+            df = pd.DataFrame()
+        print(f"Retrieved {len(df)} rows of GRE position data for {trading_day}")
+        
+        return df
+
+    def _partition_by_trading_day(
+        self,
+        query: str,
+        output_dir: Optional[str],
+        batch_rows: int,
+        max_batch_bytes: int
+    ) -> Union[Dict[str, pd.DataFrame], str]:
+        """Split a multi-day result stream by TRADING_DAY, in memory or into a Parquet dataset."""
+        tables = {}
+        writers = {}
         
         try:
-            query = f"""
-            SELECT *
-            FROM gc_accounting.finance_uat.dt_gre_pnl_snapshot
-            WHERE TRADING_DAY = '{trading_day}'
-            ORDER BY TRADING_DAY DESC
-            LIMIT 1000;
-            """
+            for batch in self._iter_query_batches(query, batch_rows, max_batch_bytes, "gre_positions_range"):
+                trading_days = batch.column('TRADING_DAY')
+                for day in trading_days.unique().to_pylist():
+                    day_key = str(day)
+                    part = batch.filter(pc.equal(trading_days, pa.scalar(day, trading_days.type)))
+                    
+                    if output_dir is None:
+                        tables.setdefault(day_key, []).append(part)
+                        continue
+                        
+                    # Hive-style layout: the partition value lives in the directory name
+                    part = part.drop_columns(['TRADING_DAY'])
+                    if day_key not in writers:
+                        partition_dir = os.path.join(output_dir, f"TRADING_DAY={day_key}")
+                        os.makedirs(partition_dir, exist_ok=True)
+                        writers[day_key] = pq.ParquetWriter(os.path.join(partition_dir, "part-0.parquet"), part.schema)
+                    writers[day_key].write_table(part)
+        finally:
+            for writer in writers.values():
+                writer.close()
+                
+        if output_dir is not None:
+            print(f"Wrote GRE position data for {len(writers)} trading days to {output_dir}")
+            return output_dir
             
-            cursor.execute(query)
-            columns = [desc[0] for desc in cursor.description]
-            data = cursor.fetchall()
+        print(f"Retrieved GRE position data for {len(tables)} trading days")
+        return {day: pa.concat_tables(parts).to_pandas() for day, parts in sorted(tables.items())}
+
+    def get_gre_positions_for(
+        self,
+        trading_days: Iterable[Union[str, date]],
+        output_dir: Optional[str] = None,
+        batch_rows: int = 50_000,
+        max_batch_bytes: int = 64 * 1024 * 1024
+    ) -> Union[Dict[str, pd.DataFrame], str]:
+        """
+        Fetch GRE position data for several trading days with one query and one connection.
+        
+        Args:
+            trading_days: Dates as 'YYYY-MM-DD' strings or date objects
+            output_dir (str, optional): If given, write a TRADING_DAY-partitioned Parquet dataset here
+            batch_rows (int): Upper bound on rows per streamed batch
+            max_batch_bytes (int): Approximate memory ceiling per streamed batch, in bytes
             
-            df = pd.DataFrame(data, columns=columns)
-            print(f"Retrieved {len(df)} rows of GRE position data for {trading_day}")
+        Returns:
+            dict or str: DataFrames keyed by 'YYYY-MM-DD' trading day, or output_dir when writing to disk
+        """
+        day_strs = sorted({day if isinstance(day, str) else day.strftime('%Y-%m-%d') for day in trading_days})
+        if not day_strs:
+            return {} if output_dir is None else output_dir
             
-            return df
+        query = f"""
+        SELECT *
+        FROM {self.GRE_TABLE}
+        WHERE TRADING_DAY IN ({", ".join(f"'{day}'" for day in day_strs)})
+        """
+        
+        return self._partition_by_trading_day(query, output_dir, batch_rows, max_batch_bytes)
+
+    def get_gre_positions_range(
+        self,
+        start_date: str,
+        end_date: str,
+        output_dir: Optional[str] = None,
+        batch_rows: int = 50_000,
+        max_batch_bytes: int = 64 * 1024 * 1024
+    ) -> Union[Dict[str, pd.DataFrame], str]:
+        """
+        Fetch GRE position data for every trading day between two dates (inclusive) in one query.
+        
+        Args:
+            start_date (str): First date in 'YYYY-MM-DD' format
+            end_date (str): Last date in 'YYYY-MM-DD' format
+            output_dir (str, optional): If given, write a TRADING_DAY-partitioned Parquet dataset here
+            batch_rows (int): Upper bound on rows per streamed batch
+            max_batch_bytes (int): Approximate memory ceiling per streamed batch, in bytes
             
-        finally:
-            cursor.close()
-            connection.close()
+        Returns:
+            dict or str: DataFrames keyed by 'YYYY-MM-DD' trading day, or output_dir when writing to disk
+        """
+        query = f"""
+        SELECT *
+        FROM {self.GRE_TABLE}
+        WHERE TRADING_DAY BETWEEN '{start_date}' AND '{end_date}'
+        """
+        
+        return self._partition_by_trading_day(query, output_dir, batch_rows, max_batch_bytes)
 
 if __name__ == "__main__":
     # Example usage
     query = DatabricksGREQuery()
-    df = query.get_gre_positions("2025-01-17")
\ No newline at end of file
+    df = query.get_gre_positions("2025-01-17")
@@ -0,0 +1,142 @@
+"""
+Classification rules for GRE positions: underlier aliases, BTC/ETH/SOL/Alts categories,
+which trader pods are included, and per-trader category overrides.
+
+The tables below are the single place to change a rule.  ``RULES`` compiles them once into
+index lookups, so a whole column is classified in one vectorized pass; the scalar helpers
+give the same answers for row-by-row callers.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Instrument -> underlier whose price series it is risked with
+UNDERLIER_ALIASES: Dict[str, str] = {
+    'IBIT': 'BTC', 'ARKB': 'BTC', 'BTCO': 'BTC', 'GBTC': 'BTC', 'XAPO': 'BTC', 'BTC_MT_GOX': 'BTC',
+    'QETH': 'ETH', 'ETHE': 'ETH',
+    'FTX_SOL': 'SOL',
+    'LOCKED_ENA': 'ENA',
+    'LOCKED_AVAX': 'AVAX',
+}
+
+# Category (internal sub-grouping) -> underliers/tickers in it; anything else is DEFAULT_CATEGORY
+CATEGORY_MEMBERS: Dict[str, List[str]] = {
+    'BTC': ['BTC', 'IBIT', 'FBTC', 'WBTC', 'BTCO', 'ARKB', 'GBTC', 'XAPO', 'BTC_MT_GOX', 'BTC_FUND'],
+    'ETH': ['ETH', 'QETH', 'ETHE', 'ETH_FUND'],
+    'SOL': ['SOL', 'FTX_SOL', 'NONCPO_SOL', 'LOCKED_SOL'],
+}
+DEFAULT_CATEGORY = 'Alts'
+
+# Pods whose positions are included in the report
+ALLOWED_TRADERS: List[str] = ['Novo', 'Beimnet', 'Bouchra', 'Felman']
+
+# Pods included only for tickers of one category (CryptoHedges: BTC hedges only)
+RESTRICTED_TRADERS: Dict[str, str] = {'CryptoHedges': 'BTC'}
+
+# (pod, underliers, category) applied on top of the category lookup
+CATEGORY_OVERRIDES: List[Tuple[str, List[str], str]] = [
+    ('Novo', ['BGCI', 'GDAM1'], 'Passive Beta'),
+]
+
+
+class ClassificationRules:
+    """The rule tables compiled into index lookups over category codes."""
+
+    def __init__(
+        self,
+        aliases: Optional[Dict[str, str]] = None,
+        categories: Optional[Dict[str, List[str]]] = None,
+        allowed_traders: Optional[Iterable[str]] = None,
+        restricted_traders: Optional[Dict[str, str]] = None,
+        category_overrides: Optional[List[Tuple[str, List[str], str]]] = None,
+        default_category: str = DEFAULT_CATEGORY
+    ):
+        self.aliases = dict(UNDERLIER_ALIASES if aliases is None else aliases)
+        categories = dict(CATEGORY_MEMBERS if categories is None else categories)
+        self.allowed_traders = frozenset(ALLOWED_TRADERS if allowed_traders is None else allowed_traders)
+        self.restricted_traders = dict(RESTRICTED_TRADERS if restricted_traders is None else restricted_traders)
+        self.category_overrides = list(CATEGORY_OVERRIDES if category_overrides is None else category_overrides)
+        self.default_category = default_category
+
+        self._category_of = {}
+        for category, members in categories.items():
+            for member in members:
+                if member in self._category_of:
+                    raise ValueError(f"{member} is listed under both {self._category_of[member]} and {category}")
+                self._category_of[member] = category
+        for pod, category in self.restricted_traders.items():
+            if category not in categories:
+                raise ValueError(f"Unknown category {category} for restricted trader {pod}")
+
+        # Category names by code; the last code is the default
+        self.category_names = np.array(list(categories) + [default_category], dtype=object)
+        self._default_code = len(categories)
+        self._code_of = {category: code for code, category in enumerate(categories)}
+        self._member_index = pd.Index(list(self._category_of), dtype=object)
+        self._member_codes = np.array([self._code_of[c] for c in self._category_of.values()], dtype=np.int64)
+        self._alias_index = pd.Index(list(self.aliases), dtype=object)
+        self._alias_targets = np.array(list(self.aliases.values()), dtype=object)
+        self._allowed_index = pd.Index(list(self.allowed_traders), dtype=object)
+
+    # ---- scalar lookups, for row-by-row callers
+
+    def map_underlier(self, underlier):
+        return self.aliases.get(underlier, underlier)
+
+    def category_of(self, identifier) -> str:
+        return self._category_of.get(identifier, self.default_category)
+
+    def sub_grouping_of(self, underlier, ticker) -> str:
+        """Category of the underlier, else of the ticker"""
+        for identifier in (underlier, ticker):
+            if identifier in self._category_of:
+                return self._category_of[identifier]
+        return self.default_category
+
+    def includes_trader(self, pod, ticker=None) -> bool:
+        if pod in self.restricted_traders:
+            return bool(ticker) and self._category_of.get(ticker) == self.restricted_traders[pod]
+        return pod in self.allowed_traders
+
+    # ---- vectorized lookups over whole columns
+
+    @staticmethod
+    def _values(column) -> np.ndarray:
+        return np.asarray(column, dtype=object)
+
+    def _codes(self, values: np.ndarray) -> np.ndarray:
+        positions = self._member_index.get_indexer(values)
+        return np.where(positions >= 0, self._member_codes[positions], self._default_code)
+
+    def map_underliers(self, underliers) -> np.ndarray:
+        values = self._values(underliers)
+        positions = self._alias_index.get_indexer(values)
+        return np.where(positions >= 0, self._alias_targets[positions], values)
+
+    def sub_groupings(self, underliers, tickers) -> np.ndarray:
+        codes = self._codes(self._values(underliers))
+        unmatched = codes == self._default_code
+        codes[unmatched] = self._codes(self._values(tickers)[unmatched])
+        return self.category_names[codes]
+
+    def include_traders(self, pods, tickers) -> np.ndarray:
+        pods = self._values(pods)
+        included = self._allowed_index.get_indexer(pods) >= 0
+        for pod, category in self.restricted_traders.items():
+            restricted = pods == pod
+            included[restricted] = self._codes(self._values(tickers)[restricted]) == self._code_of[category]
+        return included
+
+    def categorize(self, underliers, pods) -> np.ndarray:
+        """Report category per position: the overrides, else the underlier's category"""
+        underliers = self._values(underliers)
+        pods = self._values(pods)
+        categories = self.category_names[self._codes(underliers)]
+        for pod, members, category in self.category_overrides:
+            categories[(pods == pod) & pd.Index(underliers, dtype=object).isin(members)] = category
+        return categories
+
+
+RULES = ClassificationRules()
@@ -4,6 +4,10 @@ from typing import Dict, List, Tuple, Set, Optional
 from dataclasses import dataclass
 from datetime import datetime
 from internal_data.gre.rpc import RPC
+from internal_data.gre.gre_rules import RULES
+from internal_data.gre.price_store import PriceStore
+from internal_data.gre.risk_engine import RiskEngine
+from internal_data.gre.position_table import PositionTable
 #from internal_data.databricks.databricks_query_gre import DatabricksGREQuery
 from external_data.coinmetrics.coinmetrics_client import CoinMetricsClient
 from models.trader import Trader
@@ -11,9 +15,10 @@ from models.position import Position
 from utils.config import TRADER_MAPPING, GRE_TRADER_MAPPING
 from dotenv import load_dotenv
 import os
+import requests
 
 class GREProcessor:
-    def __init__(self, mapping_file_path, data_source="beacon", as_of_date=None):
+    def __init__(self, mapping_file_path, data_source="beacon", as_of_date=None, price_store_dir=None, fallback_to_latest=False):
         """
         Initialize GREProcessor with configurable data source and historical date.
         
@@ -21,6 +26,11 @@ class GREProcessor:
             mapping_file_path (str): Path to the mapping file
             data_source (str): Either "beacon" or "databricks"
             as_of_date (str, optional): Date in YYYY-MM-DD format for historical processing
+            price_store_dir (str, optional): Directory of the persistent price/return store
+                (defaults to PRICE_STORE_DIR from the environment). When set, only the days missing
+                from the store are fetched from CoinMetrics instead of the full history.
+            fallback_to_latest (bool): If the dated Beacon request fails, retry it without a date,
+                i.e. accept the latest report in place of as_of_date's. Off by default.
         """
         load_dotenv()
         secrets_dir = os.getenv('SECRETS_DIR')
@@ -28,6 +38,7 @@ class GREProcessor:
             raise ValueError("SECRETS_DIR not found in environment variables")
 
         self.data_source = data_source
+        self.fallback_to_latest = fallback_to_latest
         # Store the provided date or use current date as fallback
         self.as_of_date = as_of_date or datetime.now().strftime('%Y-%m-%d')
         print(f"GREProcessor initialized with as_of_date: {self.as_of_date}")
@@ -41,9 +52,13 @@ class GREProcessor:
         self.coinmetrics_client = CoinMetricsClient()
         self.mapping_file_path = mapping_file_path
         
+        price_store_dir = price_store_dir or os.getenv('PRICE_STORE_DIR')
+        self.price_store = PriceStore(price_store_dir) if price_store_dir else None
+        
         # Initialize price data caches
         self.price_data_cache = {}
         self.no_price_data_tickers: Set[str] = set()
+        self.risk_engine: Optional[RiskEngine] = None
 
     def fetch_data(self, databricks_df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
         """Fetch data from either Beacon RPC or Databricks."""
@@ -73,25 +88,18 @@ class GREProcessor:
                 rpt_date = self.as_of_date.replace('-', '')
                 print(f"Using report date: {rpt_date} (from as_of_date: {self.as_of_date})")
             
-            # First try with the date parameter
+            # The response is decoded column-wise as it streams in. Only a failed request can fall back,
+            # and only when enabled: a report for another day must not silently stand in for as_of_date's
             try:
                 print(f"Attempting to call Beacon API with date parameter: {rpt_date}")
-                response = self.beacon_rpc.get_rpc('users/galaxy/jc/beacon_api/generate_gre', 
-                                                  rpt_date=rpt_date)
-            except Exception as e:
+                return self.beacon_rpc.get_rpc_frame('users/galaxy/jc/beacon_api/generate_gre', 
+                                                     rpt_date=rpt_date)
+            except requests.RequestException as e:
+                if not self.fallback_to_latest:
+                    raise
                 print(f"Failed with date parameter, error: {str(e)}")
-                # If that fails, try without the date parameter (fallback to default behavior)
                 print("Attempting to call Beacon API without date parameter...")
-                response = self.beacon_rpc.get_rpc('users/galaxy/jc/beacon_api/generate_gre')
-            res_dict = response.json()
-            
-            if not res_dict.get('content'):
-                raise ValueError("No content received from Beacon RPC")
-                
-            columns = res_dict['content'][0]
-            rows = res_dict['content'][1:]
-            
-            return pd.DataFrame(rows, columns=columns)
+                return self.beacon_rpc.get_rpc_frame('users/galaxy/jc/beacon_api/generate_gre')
             
         except Exception as e:
             print(f"Error fetching data from Beacon RPC: {str(e)}")
@@ -100,89 +108,48 @@ class GREProcessor:
             raise RuntimeError(f"Failed to fetch data from Beacon RPC: {str(e)}")
 
     def _map_underlier(self, row) -> str:
-        underlier = row['Underlier']
-
-        if underlier in ['IBIT', 'ARKB', 'BTCO', 'GBTC']:
-            return 'BTC'
-        
-        if underlier == 'XAPO':
-            return 'BTC'
-        
-        if underlier == 'BTC_MT_GOX':
-            return 'BTC'
-        
-        if underlier in ['QETH', 'ETHE']:
-            return 'ETH'
-        
-        if underlier == 'FTX_SOL':
-            return 'SOL'
-        
-        if underlier == 'LOCKED_ENA':
-            return 'ENA'
-
-        if underlier == 'LOCKED_AVAX':
-            return 'AVAX'
-
-        return underlier
+        return RULES.map_underlier(row['Underlier'])
 
     def _get_internal_sub_grouping(self, underlier: str, ticker: str) -> str:
         """Determine the internal sub-grouping based on underlier and ticker."""
-        # BTC related instruments
-        btc_identifiers = {
-            'BTC', 'IBIT', 'FBTC', 'WBTC', 'BTC_MT_GOX', 'ARKB', 'BTCO', 
-            'GBTC', 'XAPO'
-        }
-        
-        # ETH related instruments
-        eth_identifiers = {'ETH', 'QETH', 'ETHE'}
-        
-        # SOL related instruments
-        sol_identifiers = {'SOL', 'FTX_SOL'}
-        
-        # Check both underlier and ticker against identifiers
-        for identifier in (underlier, ticker):
-            if identifier in btc_identifiers:
-                return 'BTC'
-            if identifier in eth_identifiers:
-                return 'ETH'
-            if identifier in sol_identifiers:
-                return 'SOL'
-        
-        return 'Alts'
+        return RULES.sub_grouping_of(underlier, ticker)
 
     def _should_include_trader(self, trader_raw: str, ticker: str = None) -> bool:
         """
-        Determine if a trader should be included based on GRE_TRADER_MAPPING.
+        Determine if a trader should be included, per the allow-list in gre_rules.
         Special handling for CryptoHedges: only include if ticker is BTC-related.
         """
-        if trader_raw == 'CryptoHedges':
-            # Only include CryptoHedges positions if they are BTC-related
-            btc_identifiers = {
-                'BTC', 'IBIT', 'FBTC', 'WBTC', 'BTC_MT_GOX', 'ARKB', 'BTCO', 
-                'GBTC', 'XAPO'
-            }
-            return ticker in btc_identifiers if ticker else False
-            
-        allowed_traders = {'Novo', 'Beimnet', 'Bouchra', 'Felman'}
-        return trader_raw in allowed_traders
+        return RULES.includes_trader(trader_raw, ticker)
+
+    def _map_underliers(self, underliers: pd.Series) -> pd.Series:
+        """Column-wise _map_underlier."""
+        return pd.Series(RULES.map_underliers(underliers), index=underliers.index, dtype=object)
 
     def _preprocess_price_data(self, df: pd.DataFrame):
         """Pre-process all unique underliers to get price data in batch."""
+        if df.empty or 'Underlier' not in df.columns:
+            # Nothing to price (e.g. a day without positions)
+            self.risk_engine = RiskEngine(pd.DataFrame())
+            return
+
         # Get unique underliers after mapping
-        unique_underliers = set()
-        for _, row in df.iterrows():
-            mapped_underlier = self._map_underlier(row)
-            unique_underliers.add(mapped_underlier)
-
-        # Process all underliers through CoinMetrics
-        results = self.coinmetrics_client.process_mapping(
-            self.mapping_file_path,  # Use the stored mapping file path
-            list(unique_underliers),
-            end_date=self.as_of_date if self.data_source == "databricks" else None
-        )
-        
-        # Create aligned dataframes
-        df_prices, df_returns = self.coinmetrics_client.create_aligned_dfs(results)
+        unique_underliers = set(self._map_underliers(df['Underlier']).unique())
+
+        end_date = self.as_of_date if self.data_source == "databricks" else None
+        if self.price_store is not None:
+            # Top up the store with the missing days, then read the aligned history from it
+            self.price_store.update(self.coinmetrics_client, self.mapping_file_path, unique_underliers, end_date=end_date)
+            df_prices, df_returns = self.price_store.aligned(unique_underliers, end_date=end_date)
+        else:
+            # Process all underliers through CoinMetrics
+            results = self.coinmetrics_client.process_mapping(
+                self.mapping_file_path,  # Use the stored mapping file path
+                list(unique_underliers),
+                end_date=end_date
+            )
+            
+            # Create aligned dataframes
+            df_prices, df_returns = self.coinmetrics_client.create_aligned_dfs(results)
         
         # Cache the results
         for underlier in unique_underliers:
@@ -192,6 +159,9 @@ class GREProcessor:
                 self.price_data_cache[underlier] = (return_series, latest_price)
             else:
                 self.no_price_data_tickers.add(underlier)
+        
+        # Volatilities and covariances once per underlier, shared by every position
+        self.risk_engine = RiskEngine(df_returns)
 
     def _get_price_data(self, underlier: str) -> Optional[Tuple[np.ndarray, float]]:
         """Get cached price data for an underlier."""
@@ -200,6 +170,12 @@ class GREProcessor:
         self.no_price_data_tickers.add(underlier)
         return None
 
+    def _get_volatility(self, underlier: str, return_series: np.ndarray) -> float:
+        """Volatility of an underlier's returns, from the risk engine when it has the underlier."""
+        if self.risk_engine is not None and underlier in self.risk_engine.volatility.index:
+            return self.risk_engine.volatility[underlier]
+        return np.std(return_series)
+
     def _parse_option_details(self, ticker: str) -> Tuple[Optional[float], Optional[str]]:
         """Parse strike price and expiry from option ticker."""
         if not ticker or '-' not in ticker:
@@ -261,7 +237,7 @@ class GREProcessor:
         
         if price_data is not None:
             return_series, latest_price = price_data
-            volatility = np.std(return_series)
+            volatility = self._get_volatility(mapped_underlier, return_series)
             dollar_volatility = volatility * delta
 
         # Parse strike and expiry for options
@@ -327,8 +303,115 @@ class GREProcessor:
 
         return position
 
-    def process_data(self, data: pd.DataFrame) -> Tuple[List[Position], List[str]]:
-        """Process GRE data into positions."""
+    def _position_frame(self, data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Column-wise equivalent of the filters and calculations in process_data/_create_position.
+        Returns one row per position in input order, with a column per Position field plus the
+        mapped underlier; mappings, volatilities and option tickers are evaluated once per distinct value.
+        """
+        if '$Delta' not in data.columns:
+            return pd.DataFrame()  # row.get('$Delta', 0) skips every row
+
+        pod = data['Pod(L2)']
+        ticker = data['Ticker']
+        keep = (data['Book(L3)'] == 'Crypto') & (data['Business(L0)'] == 'PrincipalTrading')
+        keep &= ~(data['$Delta'].abs() < 1e-10)
+        keep &= RULES.include_traders(pod, ticker)
+        df = data[keep]
+
+        pod = df['Pod(L2)']
+        ticker = df['Ticker']
+        underlier = df['Underlier']
+        delta = df['$Delta']
+        is_hedge = (pod == 'CryptoHedges').to_numpy()
+        is_option = (df['Type'] == 'CryptoOption').to_numpy()
+        mapped_underlier = self._map_underliers(underlier)
+
+        # Volatility once per underlier rather than once per position
+        volatility_by_underlier = {}
+        for mapped in mapped_underlier.unique():
+            price_data = self._get_price_data(mapped)
+            if price_data is not None:
+                volatility_by_underlier[mapped] = self._get_volatility(mapped, price_data[0])
+        has_price = mapped_underlier.isin(list(volatility_by_underlier)).to_numpy()
+        volatility = mapped_underlier.map(volatility_by_underlier).where(has_price, 0.0)
+        dollar_volatility = np.where(has_price, volatility * delta, 0.0)
+
+        # Strike/expiry parsed once per distinct option ticker
+        parsed = {t: self._parse_option_details(t) for t in ticker[is_option].unique()}
+        strike = np.array([parsed[t][0] if opt else None for t, opt in zip(ticker, is_option)], dtype=object)
+        expiry = np.array([parsed[t][1] if opt else None for t, opt in zip(ticker, is_option)], dtype=object)
+        if not is_option.all():
+            expiry[~is_option] = df['Expiry'].astype(object).to_numpy()[~is_option]
+        use_strike = is_option & np.array([k is not None for k in strike], dtype=bool)
+        strike_values = np.where(use_strike, strike, np.nan).astype(float)
+        contract_size = 1
+        notional_value = df['Quantity'] * np.where(use_strike, strike_values, df['Price']) * contract_size
+
+        sub_grouping = RULES.sub_groupings(underlier, ticker)
+        trader_names = {p: GRE_TRADER_MAPPING.get(p, p) for p in pod.unique()}
+
+        return pd.DataFrame({
+            'trader_name': pod.map(trader_names),
+            'strategy': df['Strategy(L4)'].astype(str) + ' ' + df['PositionBlock(L5)'].astype(str),
+            'security_type': df['Type'],
+            'underlier': underlier,
+            'mapped_underlier': mapped_underlier,
+            'ticker': ticker,
+            'market_value': df['Value'],
+            'notional_value': notional_value,
+            'delta': delta,
+            'gamma': df['$Gamma'],
+            'vega': df['$Vega'],
+            'theta': df['$Theta'],
+            'percent_delta': df['%Delta'],
+            # Explicit object dtype keeps None as None instead of being inferred as a missing value
+            'expiry': pd.Series(expiry, index=df.index, dtype=object),
+            'strike': pd.Series(strike, index=df.index, dtype=object),
+            'quantity': df['Quantity'],
+            'price_source': np.where(has_price, 'CoinMetrics', 'Missing'),
+            'price': df['Price'],
+            'underlying_price': df['Price'],
+            'contract_size': contract_size,
+            'volatility': volatility,
+            'dollar_volatility': dollar_volatility,
+            'amount_risked': delta,
+            'internal_grouping': np.where(is_hedge, 'Other_Macro', 'Crypto_Macro'),
+            'internal_sub_grouping': np.where(is_hedge, 'BTC', sub_grouping),
+        }, index=df.index)
+
+    def process_frame(self, data: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
+        """Process GRE data into a frame of positions (one column per Position field), without creating Position objects."""
+        self._preprocess_price_data(data)
+        return self._position_frame(data), list(self.no_price_data_tickers)
+
+    def process_table(self, data: pd.DataFrame) -> Tuple[PositionTable, List[str]]:
+        """Process GRE data into a columnar PositionTable, with each return series stored once per underlier."""
+        frame, missing = self.process_frame(data)
+        return PositionTable.from_frame(frame, self.price_data_cache), missing
+
+    def risk_rollup(self, frame: pd.DataFrame, method: str = 'simple') -> Dict[str, pd.DataFrame]:
+        """
+        Portfolio, trader and sub-grouping dollar volatility and parametric VaR of a process_frame
+        result, using the covariance of the last processed run ('simple' or 'ewma').
+        """
+        if self.risk_engine is None:
+            raise ValueError("No price data processed yet; call process_frame first")
+        return self.risk_engine.rollup(frame, method=method)
+
+    def process_data(self, data: pd.DataFrame, vectorized: bool = False) -> Tuple[List[Position], List[str]]:
+        """
+        Process GRE data into positions.
+        
+        Args:
+            data (pd.DataFrame): GRE positions as returned by fetch_data
+            vectorized (bool): Compute all filters and fields column-wise and only build the
+                Position objects at the end; produces the same positions as the row-wise path
+        """
+        if vectorized:
+            table, missing = self.process_table(data)
+            return list(table.iter_positions()), missing
+            
         # Pre-process all price data first
         self._preprocess_price_data(data)
         
@@ -350,7 +433,7 @@ class GREProcessor:
 
         return processed_positions, list(self.no_price_data_tickers)
 
-    def process(self, databricks_df: Optional[pd.DataFrame] = None) -> Tuple[List[Position], List[str]]:
+    def process(self, databricks_df: Optional[pd.DataFrame] = None, vectorized: bool = False) -> Tuple[List[Position], List[str]]:
         """Main processing pipeline."""
         df = self.fetch_data(databricks_df)
-        return self.process_data(df)
\ No newline at end of file
+        return self.process_data(df, vectorized=vectorized)
\ No newline at end of file
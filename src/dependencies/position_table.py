@@ -0,0 +1,97 @@
+"""
+Columnar table of processed GRE positions.
+
+One column per Position field instead of one object per position; string fields are
+categoricals, and each underlier's return series is stored once and referenced by code.
+Legacy callers can still iterate Position objects, built on demand.
+"""
+
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from models.position import Position
+from models.trader import Trader
+from utils.config import TRADER_MAPPING
+
+CATEGORICAL_COLUMNS = [
+    'trader_name', 'strategy', 'security_type', 'underlier', 'ticker',
+    'price_source', 'internal_grouping', 'internal_sub_grouping',
+]
+
+
+class PositionTable:
+    GREEKS = ['delta', 'gamma', 'vega', 'theta']
+
+    def __init__(self, columns: pd.DataFrame, return_series: List[np.ndarray], series_codes: np.ndarray, underliers: List[str]):
+        """
+        Args:
+            columns (pd.DataFrame): One row per position, one column per scalar Position field
+            return_series (list): Return series per underlier, referenced by series_codes
+            series_codes (np.ndarray): Index into return_series per position, -1 for no price data
+            underliers (list): Underlier of each entry of return_series
+        """
+        self.columns = columns
+        self.return_series = return_series
+        self.series_codes = series_codes
+        self.underliers = underliers
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, price_data_cache: Dict[str, Tuple[np.ndarray, float]]) -> 'PositionTable':
+        """Build from a GREProcessor position frame, sharing the return series of its price cache"""
+        if 'mapped_underlier' not in frame.columns:
+            return cls(pd.DataFrame(), [], np.empty(0, dtype=np.int32), [])
+
+        frame = frame.reset_index(drop=True)
+        mapped_underlier = frame['mapped_underlier']
+        has_series = (frame['price_source'] == 'CoinMetrics').to_numpy()
+        underliers = list(pd.unique(mapped_underlier[has_series]))
+        series_codes = np.full(len(frame), -1, dtype=np.int32)
+        series_codes[has_series] = pd.Index(underliers, dtype=object).get_indexer(mapped_underlier[has_series])
+
+        columns = frame.drop(columns=['mapped_underlier'])
+        for column in CATEGORICAL_COLUMNS:
+            columns[column] = columns[column].astype('category')
+        return cls(columns, [price_data_cache[u][0] for u in underliers], series_codes, underliers)
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    def __iter__(self) -> Iterator[Position]:
+        return self.iter_positions()
+
+    def __getitem__(self, i: int) -> Position:
+        return self._position(i, self.columns.iloc[i].to_dict())
+
+    def groupby_sum(self, by: Union[str, Sequence[str]], fields: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Sum of the greeks (or other numeric fields) per group, e.g. by=['trader_name', 'internal_sub_grouping']"""
+        fields = list(self.GREEKS if fields is None else fields)
+        values = self.columns[fields].apply(pd.to_numeric, errors='coerce')
+        keys = [self.columns[b] for b in ([by] if isinstance(by, str) else by)]
+        return values.groupby(keys, observed=True).sum()
+
+    def to_frame(self) -> pd.DataFrame:
+        """The scalar columns plus the underlier whose return series each position references"""
+        frame = self.columns.copy()
+        frame['return_series_underlier'] = pd.Categorical.from_codes(self.series_codes, categories=self.underliers) \
+            if self.underliers else pd.Categorical([None] * len(frame))
+        return frame
+
+    def _position(self, i: int, record: dict) -> Position:
+        trader_obj = TRADER_MAPPING.get(record['trader_name'])
+        if trader_obj is None:
+            trader_obj = Trader(record['trader_name'], 'Unknown Group')
+        code = self.series_codes[i]
+        return Position(
+            trader=trader_obj,
+            sid=None,
+            return_time_series=self.return_series[code] if code >= 0 else np.array([]),
+            ignore=False,
+            **record
+        )
+
+    def iter_positions(self) -> Iterator[Position]:
+        """Position objects for legacy callers, built one at a time"""
+        for i, record in enumerate(self.columns.to_dict('records')):
+            yield self._position(i, record)
@@ -0,0 +1,149 @@
+"""
+On-disk store of daily CoinMetrics prices and returns, one memory-mapped file per underlier.
+
+Each underlier is a single ``.npy`` record array of (date, price, return), ascending by date.
+Files are replaced atomically, so any number of processes can read them (memory-mapped,
+read-only) while one of them appends the days it was missing.
+"""
+
+import logging
+import os
+from datetime import date, datetime, timezone
+from typing import Iterable, Optional, Set, Tuple, Union
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+RECORD_DTYPE = np.dtype([('date', 'M8[D]'), ('price', 'f8'), ('return', 'f8')])
+
+
+def _day_index(index) -> np.ndarray:
+    """Dates of a price/return index as datetime64[D], whether naive, tz-aware or plain dates"""
+    index = pd.to_datetime(pd.Index(index), utc=True).tz_convert(None).normalize()
+    return index.values.astype('M8[D]')
+
+
+class PriceStore:
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        os.makedirs(store_dir, exist_ok=True)
+
+    def _path(self, underlier: str) -> str:
+        return os.path.join(self.store_dir, quote(str(underlier), safe='') + '.npy')
+
+    def load(self, underlier: str) -> Optional[np.ndarray]:
+        """Read-only memory map of an underlier's records, or None if nothing is stored"""
+        try:
+            return np.load(self._path(underlier), mmap_mode='r')
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def last_date(self, underlier: str) -> Optional[date]:
+        records = self.load(underlier)
+        if records is None or len(records) == 0:
+            return None
+        return records['date'][-1].item()
+
+    def append(self, underlier: str, prices: pd.Series, returns: pd.Series) -> int:
+        """Add the days after the last stored one; returns the number of days added"""
+        new = pd.DataFrame({
+            'price': pd.Series(prices.to_numpy(dtype='f8'), index=_day_index(prices.index)),
+            'return': pd.Series(returns.to_numpy(dtype='f8'), index=_day_index(returns.index)),
+        })
+        new = new[~new.index.duplicated(keep='last')].sort_index()
+
+        stored = self.load(underlier)
+        if stored is not None and len(stored):
+            new = new[new.index.values > stored['date'][-1]]
+        if new.empty:
+            return 0
+
+        records = np.empty(len(new), dtype=RECORD_DTYPE)
+        records['date'] = new.index.values.astype('M8[D]')
+        records['price'] = new['price'].to_numpy()
+        records['return'] = new['return'].to_numpy()
+        if stored is not None:
+            records = np.concatenate([np.asarray(stored), records])
+
+        path = self._path(underlier)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, records)
+        os.replace(tmp_path, path)
+        return len(new)
+
+    def update(
+        self,
+        client,
+        mapping_file_path: str,
+        underliers: Iterable[str],
+        end_date: Optional[Union[str, date]] = None
+    ) -> Set[str]:
+        """
+        Fetch from CoinMetrics only the days each underlier is missing, up to end_date (default today).
+        Underliers are fetched one at a time so one asset's gaps can't drop days from another's history.
+        The client's process_mapping must accept start_date; one that doesn't raises TypeError here
+        rather than silently re-downloading every underlier's full history.
+        Returns the underliers CoinMetrics had no data for.
+        """
+        end = pd.Timestamp(end_date).date() if end_date is not None else datetime.now(timezone.utc).date()
+        missing = set()
+
+        for underlier in underliers:
+            last = self.last_date(underlier)
+            if last is not None and last >= end:
+                continue
+
+            kws = {'end_date': end_date}
+            if last is not None:
+                # Overlap one stored day so the first new return is computed against a known price
+                kws['start_date'] = last.strftime('%Y-%m-%d')
+            try:
+                results = client.process_mapping(mapping_file_path, [underlier], **kws)
+                df_prices, df_returns = client.create_aligned_dfs(results)
+            except TypeError:
+                raise
+            except Exception as e:
+                logger.warning("CoinMetrics fetch for %s failed: %s", underlier, e)
+                if last is None:
+                    missing.add(underlier)
+                continue
+
+            if underlier not in df_prices.columns or underlier not in df_returns.columns:
+                if last is None:
+                    missing.add(underlier)
+                continue
+            added = self.append(underlier, df_prices[underlier].dropna(), df_returns[underlier])
+            logger.info("Price store: added %d day(s) for %s", added, underlier)
+
+        return missing
+
+    def aligned(
+        self,
+        underliers: Iterable[str],
+        end_date: Optional[Union[str, date]] = None
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Prices and returns of the stored underliers on their common dates, newest first
+        (the layout of CoinMetricsClient.create_aligned_dfs).
+        """
+        end = np.datetime64(pd.Timestamp(end_date).date(), 'D') if end_date is not None else None
+        prices, returns = {}, {}
+        for underlier in underliers:
+            records = self.load(underlier)
+            if records is None or len(records) == 0:
+                continue
+            if end is not None:
+                records = records[:np.searchsorted(records['date'], end, side='right')]
+            index = pd.DatetimeIndex(records['date'].astype('M8[ns]'))
+            prices[underlier] = pd.Series(records['price'], index=index)
+            returns[underlier] = pd.Series(records['return'], index=index).dropna()
+
+        if not prices:
+            return pd.DataFrame(), pd.DataFrame()
+        df_prices = pd.concat(prices, axis=1, join='inner').sort_index(ascending=False)
+        df_returns = pd.concat(returns, axis=1, join='inner').sort_index(ascending=False)
+        return df_prices, df_returns
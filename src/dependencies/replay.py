@@ -0,0 +1,355 @@
+"""
+Record/replay stand-ins for the Databricks SQL and Beacon HTTP clients.
+
+Recording wraps the live clients and writes every query result and Beacon response into a
+single SQLite snapshot file; replaying serves the same calls from that file with no network
+access, so the report pipeline can be run, benchmarked and profiled offline::
+
+    store = SnapshotStore('snapshots.sqlite')
+
+    # Record against the live services
+    live = GDTDataManager()
+    gdt = GDTDataManager(connection_factory=recording_connection_factory(live._get_connection, store))
+    rpc = RPC(session=RecordingSession(store))
+
+    # Replay later, anywhere
+    gdt = GDTDataManager(access_token='replay', connection_factory=replay_connection_factory(store))
+    write_replay_credentials('/tmp/beacon_replay')
+    rpc = RPC(secrets_dir='/tmp/beacon_replay', session=ReplaySession(store))
+
+Queries are matched on their whitespace-normalised SQL text and HTTP calls on method, path,
+query parameters and body, so the code under replay must issue the same calls it recorded.
+"""
+
+import base64
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, Optional
+from urllib.parse import urlsplit
+
+import pyarrow as pa
+import requests
+from requests.utils import get_encoding_from_headers
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotMissingError(LookupError):
+    """Raised when a replayed query or request was never recorded"""
+
+
+class SnapshotStore:
+    """SQLite file holding recorded query results (as Arrow IPC) and HTTP responses"""
+
+    # Response headers worth replaying; cookies and transport headers are not recorded
+    KEPT_HEADERS = ('Content-Type', 'Content-Disposition', 'ETag', 'Last-Modified')
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS queries "
+                "(key TEXT PRIMARY KEY, query TEXT, recorded_at REAL, payload BLOB)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS http "
+                "(key TEXT PRIMARY KEY, method TEXT, path TEXT, status INTEGER, headers TEXT, recorded_at REAL, content BLOB)"
+            )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        return re.sub(r'\s+', ' ', query).strip()
+
+    @classmethod
+    def _query_key(cls, query: str) -> str:
+        return hashlib.sha256(cls.normalize_query(query).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _http_key(method: str, url: str, params=None, data=None, json_body=None) -> str:
+        # Keyed on the path only, so a recording replays against any Beacon domain
+        parts = urlsplit(url)
+        body = json_body if json_body is not None else data
+        if isinstance(body, bytes):
+            body = hashlib.sha256(body).hexdigest()
+        elif not isinstance(body, (str, dict, list, tuple, type(None))):
+            body = None  # Streamed bodies (e.g. uploads) are not part of the key
+        key = json.dumps([method.lower(), parts.path, parts.query, params, body], sort_keys=True, default=str)
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def put_query(self, query: str, table: pa.Table):
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO queries VALUES (?, ?, ?, ?)",
+                (self._query_key(query), self.normalize_query(query), time.time(), sink.getvalue())
+            )
+
+    def get_query(self, query: str) -> Optional[pa.Table]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT payload FROM queries WHERE key = ?", (self._query_key(query),)
+            ).fetchone()
+        if row is None:
+            return None
+        return pa.ipc.open_stream(row[0]).read_all()
+
+    def put_response(self, method: str, url: str, response: requests.Response, params=None, data=None, json_body=None):
+        headers = {k: response.headers[k] for k in self.KEPT_HEADERS if k in response.headers}
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO http VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self._http_key(method, url, params, data, json_body), method.lower(), urlsplit(url).path,
+                 response.status_code, json.dumps(headers), time.time(), response.content)
+            )
+
+    def get_response(self, method: str, url: str, params=None, data=None, json_body=None) -> Optional[requests.Response]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, headers, content FROM http WHERE key = ?",
+                (self._http_key(method, url, params, data, json_body),)
+            ).fetchone()
+        if row is None:
+            return None
+        status, headers, content = row
+        return _build_response(url, status, json.loads(headers), content)
+
+
+def _build_response(url, status_code, headers, content) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers)
+    response.url = url
+    response.reason = 'OK' if status_code < 400 else 'Error'
+    response.encoding = get_encoding_from_headers(response.headers)
+    response._content = content
+    response._content_consumed = True
+    return response
+
+
+# ---------------------------------------------------------------- Databricks SQL
+
+class ReplayCursor:
+    """Cursor answering `execute` from recorded results (the subset of the Databricks cursor the clients use)"""
+
+    def __init__(self, store: SnapshotStore):
+        self._store = store
+        self._table = None
+        self._offset = 0
+        self.query_id = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def execute(self, query: str, parameters=None):
+        table = self._store.get_query(query)
+        if table is None:
+            raise SnapshotMissingError(f"No recorded result for query: {self._store.normalize_query(query)[:200]}")
+        self._table = table
+        self._offset = 0
+
+    @property
+    def description(self):
+        if self._table is None:
+            return None
+        return [(field.name, str(field.type), None, None, None, None, True) for field in self._table.schema]
+
+    def fetchmany_arrow(self, size: int) -> pa.Table:
+        batch = self._table.slice(self._offset, size)
+        self._offset += batch.num_rows
+        return batch
+
+    def fetchall_arrow(self) -> pa.Table:
+        batch = self._table.slice(self._offset)
+        self._offset = self._table.num_rows
+        return batch
+
+    def fetchall(self):
+        columns = self.fetchall_arrow().to_pydict()
+        return list(zip(*columns.values())) if columns else []
+
+    def close(self):
+        self._table = None
+
+
+class ReplayConnection:
+    def __init__(self, store: SnapshotStore):
+        self._store = store
+        self.open = True
+
+    def cursor(self) -> ReplayCursor:
+        return ReplayCursor(self._store)
+
+    def close(self):
+        self.open = False
+
+
+class RecordingCursor:
+    """Cursor wrapper that saves every fully read result to the store"""
+
+    def __init__(self, cursor, store: SnapshotStore):
+        self._cursor = cursor
+        self._store = store
+        self._query = None
+        self._batches = []
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def execute(self, query: str, *args, **kws):
+        self._query = query
+        self._batches = []
+        return self._cursor.execute(query, *args, **kws)
+
+    def fetchall_arrow(self) -> pa.Table:
+        table = self._cursor.fetchall_arrow()
+        self._save(self._batches + [table])
+        return table
+
+    def fetchmany_arrow(self, size: int) -> pa.Table:
+        batch = self._cursor.fetchmany_arrow(size)
+        self._batches.append(batch)
+        if batch.num_rows < size:
+            # Short batch: the result is exhausted
+            self._save(self._batches)
+        return batch
+
+    def _save(self, batches):
+        if self._query is not None:
+            self._store.put_query(self._query, pa.concat_tables(batches))
+        self._query = None
+        self._batches = []
+
+    def close(self):
+        # A partially read result is not recorded
+        self._query = None
+        self._batches = []
+        self._cursor.close()
+
+
+class RecordingConnection:
+    def __init__(self, connection, store: SnapshotStore):
+        self._connection = connection
+        self._store = store
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def cursor(self) -> RecordingCursor:
+        return RecordingCursor(self._connection.cursor(), self._store)
+
+    def close(self):
+        self._connection.close()
+
+
+def replay_connection_factory(store: SnapshotStore) -> Callable[[], ReplayConnection]:
+    """``connection_factory`` for GDTDataManager / DatabricksGREQuery serving recorded results"""
+    return lambda: ReplayConnection(store)
+
+
+def recording_connection_factory(connect: Callable[[], object], store: SnapshotStore) -> Callable[[], RecordingConnection]:
+    """``connection_factory`` that runs queries on live connections from ``connect`` and records the results"""
+    return lambda: RecordingConnection(connect(), store)
+
+
+# ---------------------------------------------------------------- Beacon HTTP
+
+AUTH_PATH = '/login/authtoken'
+
+
+def _fake_token(lifetime: int = 86400) -> str:
+    def encode(obj):
+        return base64.urlsafe_b64encode(json.dumps(obj).encode('utf-8')).decode('ascii').rstrip('=')
+    return '.'.join((encode({'alg': 'none'}), encode({'exp': int(time.time()) + lifetime}), 'replay'))
+
+
+def write_replay_credentials(secrets_dir: str, domain_url: str = 'https://replay.invalid'):
+    """Write placeholder token and client id files so an RPC can be built without real credentials"""
+    os.makedirs(secrets_dir, exist_ok=True)
+    with open(os.path.join(secrets_dir, 'beacon_token_replay.json'), 'w') as f:
+        json.dump({'token_id': 'replay', 'token_secret': 'replay', 'created': 0, 'url': domain_url}, f)
+    with open(os.path.join(secrets_dir, 'beacon_client_id_replay.json'), 'w') as f:
+        json.dump({'client_id': 'replay', 'client_secret': 'replay'}, f)
+
+
+class _SessionBase:
+    def get(self, url, *args, **kws):
+        return self.request('get', url, *args, **kws)
+
+    def post(self, url, *args, **kws):
+        return self.request('post', url, *args, **kws)
+
+    def put(self, url, *args, **kws):
+        return self.request('put', url, *args, **kws)
+
+    def delete(self, url, *args, **kws):
+        return self.request('delete', url, *args, **kws)
+
+    @staticmethod
+    def _key_args(args, kws):
+        # requests' positional order is (params) for get and (data, json) for post/put
+        params = kws.get('params', args[0] if args and isinstance(args[0], dict) else None)
+        return dict(params=params, data=kws.get('data'), json_body=kws.get('json'))
+
+
+class ReplaySession(_SessionBase):
+    """Stand-in for the `requests.Session` used by RPC, answering from recorded responses.
+
+    Token requests are answered with a locally issued token, so no credentials are needed.
+    """
+
+    def __init__(self, store: SnapshotStore):
+        self.store = store
+
+    def request(self, method, url, *args, **kws):
+        if urlsplit(url).path.endswith(AUTH_PATH):
+            return _build_response(url, 200, {'Content-Type': 'text/plain'}, _fake_token().encode('ascii'))
+        response = self.store.get_response(method, url, **self._key_args(args, kws))
+        if response is None:
+            raise SnapshotMissingError(f"No recorded response for {method.upper()} {urlsplit(url).path}")
+        return response
+
+    def close(self):
+        pass
+
+
+class RecordingSession(_SessionBase):
+    """Wraps a live `requests.Session` and records every Beacon response except token requests"""
+
+    def __init__(self, store: SnapshotStore, session: Optional[requests.Session] = None):
+        self.store = store
+        self.session = session or requests.Session()
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def request(self, method, url, *args, **kws):
+        response = getattr(self.session, method)(url, *args, **kws)
+        if urlsplit(url).path.endswith(AUTH_PATH):
+            return response  # Never write a bearer token to disk
+        # Reading .content buffers a streamed body; iter_content then serves it from memory
+        self.store.put_response(method, url, response, **self._key_args(args, kws))
+        return response
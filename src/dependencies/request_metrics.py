@@ -0,0 +1,134 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+
+class _OperationStats:
+    def __init__(self, max_samples: int):
+        self.count = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.bytes = 0
+        self.rows = 0
+        self.latencies = deque(maxlen=max_samples)
+
+
+class RequestMetrics:
+    """
+    Collects per-request timings from the report's data clients.
+
+    Pass one instance as ``metrics=`` to GDTDataManager, DatabricksGREQuery and RPC; each of them
+    calls ``record`` once per query or HTTP request (and RPC once per token renewal). Read the
+    results back with ``summary()`` or export them with ``to_prometheus()``.
+    """
+
+    def __init__(self, max_samples: int = 1000):
+        self.max_samples = max_samples
+        self._stats: Dict[Tuple[str, str], _OperationStats] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        client: str,
+        operation: str,
+        seconds: float,
+        bytes: int = 0,
+        rows: Optional[int] = None,
+        error: Optional[BaseException] = None
+    ):
+        """Record one request: its latency, bytes transferred, rows returned and any error"""
+        with self._lock:
+            stats = self._stats.get((client, operation))
+            if stats is None:
+                stats = self._stats[(client, operation)] = _OperationStats(self.max_samples)
+            stats.count += 1
+            stats.errors += error is not None
+            stats.total_seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            stats.bytes += bytes or 0
+            stats.rows += rows or 0
+            stats.latencies.append(seconds)
+
+    @contextmanager
+    def timer(self, client: str, operation: str):
+        """Time a block; the yielded dict may be filled with 'bytes' and 'rows' before it exits"""
+        fields = {}
+        start = time.perf_counter()
+        try:
+            yield fields
+        except BaseException as e:
+            self.record(client, operation, time.perf_counter() - start, error=e, **fields)
+            raise
+        self.record(client, operation, time.perf_counter() - start, **fields)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def _snapshot(self):
+        with self._lock:
+            return [(key, stats, sorted(stats.latencies)) for key, stats in sorted(self._stats.items())]
+
+    @staticmethod
+    def _quantile(samples, q: float) -> float:
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+    def summary(self) -> pd.DataFrame:
+        """One row per (client, operation), slowest total time first"""
+        records = []
+        for (client, operation), stats, samples in self._snapshot():
+            records.append({
+                'client': client,
+                'operation': operation,
+                'count': stats.count,
+                'errors': stats.errors,
+                'total_s': stats.total_seconds,
+                'mean_s': stats.total_seconds / stats.count,
+                'p50_s': self._quantile(samples, 0.5),
+                'p95_s': self._quantile(samples, 0.95),
+                'max_s': stats.max_seconds,
+                'bytes': stats.bytes,
+                'rows': stats.rows,
+            })
+        if not records:
+            return pd.DataFrame()
+        return pd.DataFrame(records).sort_values('total_s', ascending=False, ignore_index=True)
+
+    def to_prometheus(self, path: Optional[str] = None, prefix: str = 'report_request') -> str:
+        """
+        Render the metrics in the Prometheus text exposition format.
+        If path is given the text is also written there (atomically, for the node_exporter textfile collector).
+        """
+        seconds, errors, sizes, rows = [], [], [], []
+        for (client, operation), stats, samples in self._snapshot():
+            escaped = operation.replace('\\', '\\\\').replace('"', '\\"')
+            labels = f'client="{client}",operation="{escaped}"'
+            for q in (0.5, 0.95, 0.99):
+                seconds.append(f'{prefix}_seconds{{{labels},quantile="{q}"}} {self._quantile(samples, q)}')
+            seconds.append(f'{prefix}_seconds_sum{{{labels}}} {stats.total_seconds}')
+            seconds.append(f'{prefix}_seconds_count{{{labels}}} {stats.count}')
+            errors.append(f'{prefix}_errors_total{{{labels}}} {stats.errors}')
+            sizes.append(f'{prefix}_bytes_total{{{labels}}} {stats.bytes}')
+            rows.append(f'{prefix}_rows_total{{{labels}}} {stats.rows}')
+
+        # Every sample of a metric family has to follow its TYPE line
+        lines = [f"# TYPE {prefix}_seconds summary", *seconds,
+                 f"# TYPE {prefix}_errors_total counter", *errors,
+                 f"# TYPE {prefix}_bytes_total counter", *sizes,
+                 f"# TYPE {prefix}_rows_total counter", *rows]
+        text = '\n'.join(lines) + '\n'
+
+        if path:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        return text
@@ -14,19 +14,37 @@ Description: |
 """
 
 import ast
+import asyncio
 import base64
 import logging
+import array
 import glob
+import hashlib
+import io
 import itertools
 import json
 import os
+import queue
+import random
+import re
+import threading
 import time
 import typing as t
+import uuid
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, datetime
 
 import requests
+from requests.adapters import HTTPAdapter
 import ssl
 import urllib3
 
+try:
+    import ijson  # Optional: lets decode_content_frame parse the response incrementally
+except ImportError:
+    ijson = None
+
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 logger = logging.getLogger(__name__)
@@ -34,12 +52,253 @@ logger = logging.getLogger(__name__)
 # Reset SSL context to default
 ssl._create_default_https_context = ssl.create_default_context
 
+# Endpoints whose path carries per-call values; metrics and latency samples are kept per pattern, not per path
+_ENDPOINT_PATTERNS = [
+    (re.compile(r'^bob-reports/[^/]+/[^/]+/[^/]+$'), 'bob-reports/{date}/{job}/{report}'),
+    (re.compile(r'^download/'), 'download'),
+]
+
+
+def _endpoint_name(command):
+    """``command`` with its per-call parts replaced, e.g. 'download/a.csv' -> 'download'"""
+    for pattern, name in _ENDPOINT_PATTERNS:
+        if pattern.match(command or ''):
+            return name
+    return command
+
+
+class _MultipartStream:
+    """File-like multipart/form-data body that reads upload files lazily.
+
+    Passing this as ``data`` lets `requests` send the body in blocks with a known Content-Length,
+    so only one block of each file is ever held in memory.
+    """
+
+    def __init__(self, fields, files, boundary):
+        self.boundary = boundary
+        self._parts = []
+        for name, value in fields.items():
+            self._parts.append(
+                '--{}\r\nContent-Disposition: form-data; name="{}"\r\n\r\n{}\r\n'.format(boundary, name, value).encode('utf-8')
+            )
+        for field_name, filename, fileobj in files:
+            self._parts.append(
+                '--{}\r\nContent-Disposition: form-data; name="{}"; filename="{}"\r\n'
+                'Content-Type: application/octet-stream\r\n\r\n'.format(boundary, field_name, filename.replace('"', '\\"')).encode('utf-8')
+            )
+            self._parts.append(fileobj)
+            self._parts.append(b'\r\n')
+        self._parts.append('--{}--\r\n'.format(boundary).encode('utf-8'))
+
+        self.len = 0
+        for part in self._parts:
+            if isinstance(part, bytes):
+                self.len += len(part)
+            else:
+                position = part.tell()
+                self.len += part.seek(0, os.SEEK_END) - position
+                part.seek(position)
+        self._index = 0
+
+    @property
+    def content_type(self):
+        return 'multipart/form-data; boundary={}'.format(self.boundary)
+
+    def read(self, size=-1):
+        chunks = []
+        while self._index < len(self._parts) and (size < 0 or size > 0):
+            part = self._parts[self._index]
+            if isinstance(part, bytes):
+                chunk = part if size < 0 else part[:size]
+                rest = part[len(chunk):]
+                if rest:
+                    self._parts[self._index] = rest
+                else:
+                    self._index += 1
+            else:
+                chunk = part.read(size)
+                if not chunk or size < 0:
+                    self._index += 1
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            chunks.append(chunk)
+            if size > 0:
+                size -= len(chunk)
+        return b''.join(chunks)
+
+
+class _CacheTee:
+    """Read-only stand-in for a streamed response's ``raw`` that copies the decoded body to a file.
+
+    ``on_complete(path)`` is called once the body has been read to the end; a body closed before
+    that is incomplete, so its file is removed instead.
+    """
+
+    def __init__(self, raw, path, on_complete):
+        raw.decode_content = True
+        self._raw = raw
+        self._path = path
+        self._file = open(path, 'wb')
+        self._on_complete = on_complete
+
+    def read(self, size=-1):
+        to_end = size is None or size < 0
+        data = self._raw.read() if to_end else self._raw.read(size)
+        if self._file is not None:
+            if data:
+                self._file.write(data)
+            if to_end or (not data and size != 0):
+                self._file.close()
+                self._file = None
+                self._on_complete(self._path)
+        return data
+
+    def release_conn(self):
+        release_conn = getattr(self._raw, 'release_conn', None)
+        if release_conn is not None:
+            release_conn()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            try:
+                os.remove(self._path)
+            except OSError:
+                pass
+        self._raw.close()
+
+
+class _ColumnBuffer:
+    """Accumulates one column of a decoded table.
+
+    Values go into a packed int64 array while the column holds only integers, move to a packed
+    float64 array at the first float or null, and only fall back to a list of Python objects when
+    a non-numeric value (or an integer too large for int64) shows up.
+    """
+
+    def __init__(self):
+        self.ints = array.array('q')
+        self.floats = None
+        self.objects = None
+        self.has_null = False
+
+    def _to_floats(self):
+        self.floats = array.array('d', self.ints)
+        self.ints = None
+
+    def _to_objects(self):
+        # Keep the earlier values as the Python objects they were
+        if self.ints is not None:
+            self.objects = list(self.ints)
+        else:
+            self.objects = [None if n != n else n for n in self.floats] if self.has_null else list(self.floats)
+        self.ints = self.floats = None
+
+    def append(self, value):
+        if self.objects is not None:
+            self.objects.append(value)
+            return
+        if value is None:
+            if self.ints is not None:
+                self._to_floats()
+            self.has_null = True
+            self.floats.append(float('nan'))
+        elif isinstance(value, int) and not isinstance(value, bool):
+            if self.ints is None:
+                self.floats.append(value)
+                return
+            try:
+                self.ints.append(value)
+            except OverflowError:
+                self._to_objects()
+                self.objects.append(value)
+        elif isinstance(value, float):
+            if self.ints is not None:
+                self._to_floats()
+            self.floats.append(value)
+        else:
+            self._to_objects()
+            self.objects.append(value)
+
+    def values(self):
+        import numpy as np
+
+        if self.objects is not None:
+            return self.objects
+        if self.ints is not None:
+            return np.frombuffer(self.ints, dtype=np.int64) if len(self.ints) else np.empty(0, dtype=np.float64)
+        return np.frombuffer(self.floats, dtype=np.float64)
+
+
+def _iter_content_rows(response):
+    """Yield the rows of a Beacon ``{'content': [header, row, ...]}`` response one at a time"""
+    if response.raw is not None and not getattr(response, '_content_consumed', False):
+        # Streamed response: read straight off the socket, undoing any gzip transfer encoding
+        response.raw.decode_content = True
+        source = response.raw
+    else:
+        source = io.BytesIO(response.content)
+
+    if ijson is not None:
+        yield from ijson.items(source, 'content.item', use_float=True)
+    else:
+        yield from json.load(source).get('content') or []
+
+
+def decode_content_frame(response, as_arrow=False):
+    """Decode a Beacon table response (e.g. generate_gre) into a pandas DataFrame or pyarrow Table.
+
+    The ``content`` array is read row by row into per-column buffers, so the full list-of-lists is
+    never held in memory alongside the result.  Rows are parsed incrementally when ``ijson`` is
+    installed and the response was requested with ``stream=True``.
+
+    Raises
+    ------
+        ValueError if the response holds no header row, or a row longer than the header
+    """
+    rows = _iter_content_rows(response)
+    header = next(rows, None)
+    if not header:
+        raise ValueError('No content received from Beacon RPC')
+
+    buffers = [_ColumnBuffer() for _ in header]
+    for row_number, row in enumerate(rows, 1):
+        if len(row) > len(header):
+            raise ValueError('Row {} has {} values but the header has {} columns'.format(row_number, len(row), len(header)))
+        # Short rows are padded with nulls, as pandas does when building from a list of lists
+        for buffer, value in itertools.zip_longest(buffers, row):
+            buffer.append(value)
+
+    if as_arrow:
+        import pyarrow as pa
+
+        arrays = []
+        for buffer in buffers:
+            try:
+                arrays.append(pa.array(buffer.values(), from_pandas=True))
+            except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+                # Arrow columns are single-typed (and int64 at most); such columns are kept as text
+                arrays.append(pa.array([None if v is None else str(v) for v in buffer.values()]))
+        return pa.table(arrays, names=list(header))
+
+    import pandas as pd
+
+    df = pd.DataFrame({i: buffer.values() for i, buffer in enumerate(buffers)})
+    df.columns = header
+    return df
+
 class RPC:
     HTTP_METHODS = {'get', 'post', 'put', 'delete'}
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
     USER_TOKEN_FILE_PATTERNS = ['beacon_token_*.json', 'beacon_user_token_*.json']
     CLIENT_ID_FILE_PATTERNS = ['beacon_client_id_*.json']
 
-    def __init__(self, token_file_name=None, client_id_file_name=None, secrets_dir=None, api_url='/r/apps/wmp-proxy', command='exec', raise_for_status=True):
+    def __init__(self, token_file_name=None, client_id_file_name=None, secrets_dir=None, api_url='/r/apps/wmp-proxy', command='exec', raise_for_status=True,
+                 pool_maxsize=10, refresh_margin=300, token_cache_file=None,
+                 response_cache_dir=None, response_cache_ttl=300, response_cache_max_bytes=2 * 1024 ** 3,
+                 timeout=(10, 600), max_retries=3, backoff_base=0.5, backoff_max=30,
+                 hedge_percentile=None, hedge_min_samples=20, metrics=None, session=None):
         """Helper class to present tokens and submit authenticated requests to Beacon.
         Requires a token file and a client ID file.  You can generate and download these files from the
         Manage Keys dialog within your Beacon Profile.
@@ -74,6 +333,46 @@ class RPC:
                 if True, methods like `post` and `get` will raises Exception (from the requests API)
                 when HTTP error statuses are encountered.  When False, those methods will just return the
                 standard response from the requests API without raising exception.  Default is True.
+            pool_maxsize : int
+                Maximum number of keep-alive connections held open to the Beacon domain.  All auth and API
+                calls share one `requests.Session`, so back-to-back calls reuse a TCP+TLS connection instead
+                of opening a new one.  Release them with `close()` or by using the instance as a context manager.
+            refresh_margin : int
+                Seconds before token expiry at which a call triggers a background renewal.  The call itself
+                carries on with the still-valid token; only a token within 60 seconds of expiry blocks callers.
+            token_cache_file : str, optional
+                If set, issued bearer tokens are shared through this file (created with owner-only
+                permissions) by all processes of the same user with the same token/client id configuration.
+                A process that finds a still-valid token there makes no auth request at all.
+            response_cache_dir : str, optional
+                If set, responses of `get_rpc`, `get_rpc_frame` and `get_bobreports` are cached on disk,
+                keyed by endpoint and parameters.  Reports for a past date (``rpt_date`` / ``batch_date``)
+                never change and are kept until evicted; today's (or undated) reports expire after
+                ``response_cache_ttl`` seconds.  Least recently used entries are evicted once the cache
+                exceeds ``response_cache_max_bytes``.  Hit/miss counts are kept in ``cache_stats``.
+                Streamed responses are written to the cache as they are read, and only kept once read to the end.
+            timeout : float or tuple
+                Default `requests` timeout, as seconds or (connect, read), for calls that don't pass their own.
+                Any call may also pass ``deadline=<seconds>``: a wall-clock budget covering all its retries.
+            max_retries : int
+                How many times an idempotent GET is retried after a connection error, timeout or a
+                429/5xx response.  POST/PUT/DELETE are never retried.
+            backoff_base, backoff_max : float
+                Retry n sleeps a random time between 0 and min(backoff_max, backoff_base * 2**n) seconds.
+            hedge_percentile : float, optional
+                If set (e.g. 95), a GET still running after that percentile of the endpoint's recent
+                latencies gets a duplicate request, and whichever answers first is used.  Hedging only
+                starts once ``hedge_min_samples`` latencies have been seen; streamed GETs are not hedged.
+            metrics : RequestMetrics, optional
+                If set, every call (including its retries) and every token renewal is recorded there
+                with its latency, response size and error, under the client name ``beacon``.  Calls are
+                labelled by method and endpoint, with per-call path parts folded (e.g. ``GET download``).
+            session : requests.Session, optional
+                Session to send all requests through instead of a new pooled one, e.g. a
+                `replay.RecordingSession` or `replay.ReplaySession`.  It is closed by `close()`.
+
+        Token and client id files are only read when first needed, so a process served from the token
+        cache never touches them; a missing file raises ValueError on first use rather than here.
 
         """
 
@@ -82,13 +381,59 @@ class RPC:
         self.command = command
         self.raise_for_status = raise_for_status
 
-        token_file_names = [token_file_name] if token_file_name else self._get_files_by_patterns(self.USER_TOKEN_FILE_PATTERNS)
-        client_id_file_names = [client_id_file_name] if client_id_file_name else self._get_files_by_patterns(self.CLIENT_ID_FILE_PATTERNS)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+        self.session = session
+
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self._latencies = defaultdict(lambda: deque(maxlen=200))
+        self._hedge_executor = None
+        self._pool_maxsize = pool_maxsize
+        self.metrics = metrics
+
+        self._token_file_name = token_file_name
+        self._client_id_file_name = client_id_file_name
+        self._login_token = None
+        self._client_id = None
+        self._domain_url = None
+
+        self._auth_token = ''
+        self._token_expiry = 0
+        self.refresh_margin = refresh_margin
+        # Held by whichever thread is renewing, so concurrent callers share a single auth request
+        self._token_lock = threading.Lock()
+
+        self.token_cache_file = os.path.expanduser(token_cache_file) if token_cache_file else None
+        self._token_cache_key = hashlib.sha256(json.dumps(
+            [os.path.abspath(self.secrets_dir), token_file_name, client_id_file_name]
+        ).encode('utf-8')).hexdigest()
+        if self.token_cache_file:
+            self._load_cached_token()
+
+        self.response_cache_dir = os.path.expanduser(response_cache_dir) if response_cache_dir else None
+        self.response_cache_ttl = response_cache_ttl
+        self.response_cache_max_bytes = response_cache_max_bytes
+        self.cache_stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        self._cache_lock = threading.Lock()
+        if self.response_cache_dir:
+            os.makedirs(self.response_cache_dir, exist_ok=True)
+
+    def _load_credentials(self):
+        token_file_names = [self._token_file_name] if self._token_file_name else self._get_files_by_patterns(self.USER_TOKEN_FILE_PATTERNS)
+        client_id_file_names = [self._client_id_file_name] if self._client_id_file_name else self._get_files_by_patterns(self.CLIENT_ID_FILE_PATTERNS)
 
         if not client_id_file_names:
             raise ValueError('No client id found')
         with open(client_id_file_names[0], 'r') as f:
-            self.client_id = json.load(f)
+            client_id = json.load(f)
 
         tokens = []
         for fn in token_file_names:
@@ -100,30 +445,142 @@ class RPC:
         if not tokens:
             raise ValueError('No token files found')
 
-        self.login_token = sorted(tokens, key=lambda tok: tok['created'])[0]
-        self._auth_token = ''
-        self._token_expiry = 0
-        self.domain_url = self.login_token['url'].rstrip('/')
-        self.auth_url = '/'.join((self.domain_url, 'login/authtoken'))
+        self._client_id = client_id
+        self._login_token = sorted(tokens, key=lambda tok: tok['created'])[0]
         logger.info('Will authenticate against: %s and invoke APIs against: %s', self.auth_url, self.api_url)
 
+    @property
+    def login_token(self):
+        if self._login_token is None:
+            self._load_credentials()
+        return self._login_token
+
+    @property
+    def client_id(self):
+        if self._client_id is None:
+            self._load_credentials()
+        return self._client_id
+
+    @property
+    def domain_url(self):
+        if self._domain_url is None:
+            self._domain_url = self.login_token['url'].rstrip('/')
+        return self._domain_url
+
+    @property
+    def auth_url(self):
+        return '/'.join((self.domain_url, 'login/authtoken'))
+
+    def _read_token_cache(self) -> dict:
+        try:
+            if os.name == 'posix' and os.stat(self.token_cache_file).st_mode & 0o077:
+                logger.warning('Ignoring token cache %s: readable by other users', self.token_cache_file)
+                return {}
+            with open(self.token_cache_file, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning('Ignoring unreadable token cache %s: %s', self.token_cache_file, e)
+            return {}
+
+    def _load_cached_token(self):
+        entry = self._read_token_cache().get(self._token_cache_key)
+        if entry and time.time()+60 <= entry['exp']:
+            logger.info('Using cached token for: %s', entry['domain_url'])
+            self._auth_token = entry['token']
+            self._token_expiry = entry['exp']
+            self._domain_url = entry['domain_url']
+
+    def _store_cached_token(self):
+        cache = self._read_token_cache()
+        now = time.time()
+        cache = {key: entry for key, entry in cache.items() if entry.get('exp', 0) > now}
+        cache[self._token_cache_key] = {'token': self._auth_token, 'exp': self._token_expiry, 'domain_url': self.domain_url}
+
+        # Write to a private temp file and swap it in, so readers never see a partial file
+        tmp_file = '{}.{}.tmp'.format(self.token_cache_file, os.getpid())
+        try:
+            fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(cache, f)
+            os.replace(tmp_file, self.token_cache_file)
+        except Exception as e:
+            logger.warning('Could not write token cache %s: %s', self.token_cache_file, e)
+
+    def close(self):
+        """Close the pooled HTTP connections"""
+        if self._hedge_executor is not None:
+            self._hedge_executor.shutdown(wait=False)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def _get_files_by_patterns(self, patterns: t.List[str]) -> t.List[str]:
         return sorted(itertools.chain.from_iterable(map(lambda p: glob.glob(self.secrets_dir + '/' + p), patterns)))
 
-    def get_or_renew_token(self) -> str:
-        if time.time()+60 > self._token_expiry:
-            # Need to reissue the token
-            headers = {'Authorization': 'Token {},{},{},{}'.format(
-                self.login_token['token_id'], self.login_token['token_secret'], self.client_id['client_id'], self.client_id['client_secret']
-            )}
-            logger.info('Requesting a new token from: %s', self.auth_url)
-            r = requests.get(self.auth_url, headers=headers, verify=False)  # Disable SSL verification
+    def _renew_token(self, timeout=None):
+        if self.token_cache_file:
+            # Another process may already have renewed it
+            self._load_cached_token()
+            if time.time()+self.refresh_margin <= self._token_expiry:
+                return
+
+        headers = {'Authorization': 'Token {},{},{},{}'.format(
+            self.login_token['token_id'], self.login_token['token_secret'], self.client_id['client_id'], self.client_id['client_secret']
+        )}
+        logger.info('Requesting a new token from: %s', self.auth_url)
+        start = time.perf_counter()
+        try:
+            # Bounded like any other call: callers near expiry all wait on this one request
+            r = self.session.get(self.auth_url, headers=headers, verify=False,  # Disable SSL verification
+                                 timeout=self.timeout if timeout is None else timeout)
             r.raise_for_status()
-            self._auth_token = r.text
-            # The _auth_token should be treated as a SECRET, do not expose it, do not log it etc etc.
-            payload_data = self._auth_token.split('.', 2)[1]
-            payload = json.loads(base64.urlsafe_b64decode(payload_data+'='*(4-len(payload_data)%4)).decode('utf-8'))
-            self._token_expiry = payload['exp']
+        except Exception as e:
+            self._record('token_renewal', start, error=e)
+            raise
+        self._record('token_renewal', start)
+        auth_token = r.text
+        # The _auth_token should be treated as a SECRET, do not expose it, do not log it etc etc.
+        payload_data = auth_token.split('.', 2)[1]
+        payload = json.loads(base64.urlsafe_b64decode(payload_data+'='*(4-len(payload_data)%4)).decode('utf-8'))
+        self._auth_token = auth_token
+        self._token_expiry = payload['exp']
+        if self.token_cache_file:
+            self._store_cached_token()
+
+    def _refresh_in_background(self):
+        if not self._token_lock.acquire(blocking=False):
+            return  # A renewal is already in flight
+
+        def refresh():
+            try:
+                if time.time()+self.refresh_margin > self._token_expiry:
+                    self._renew_token()
+            except Exception:
+                logger.exception('Background token renewal failed, will retry on the next call')
+            finally:
+                self._token_lock.release()
+
+        threading.Thread(target=refresh, name='beacon-token-refresh', daemon=True).start()
+
+    def get_or_renew_token(self, timeout=None) -> str:
+        """The current bearer token, renewed first if it is about to expire.
+
+        ``timeout`` bounds a blocking renewal request (default: the client's timeout).
+        """
+        if time.time()+60 > self._token_expiry:
+            # Need to reissue the token; callers arriving meanwhile wait for this single renewal
+            with self._token_lock:
+                if time.time()+60 > self._token_expiry:
+                    self._renew_token(timeout)
+        elif time.time()+self.refresh_margin > self._token_expiry:
+            # Still valid: renew ahead of time without holding up this call
+            self._refresh_in_background()
         return self._auth_token
 
     def _req(self, r, command, *args, **kws):
@@ -154,7 +611,9 @@ class RPC:
                Treats HTTP error status as exception, if raise_for_status is set
         """
 
-        kws.setdefault('headers', {})['Authorization'] = 'Bearer ' + self.get_or_renew_token()
+        deadline = kws.pop('deadline', None)
+        timeout = kws.pop('timeout', self.timeout)
+        kws.setdefault('headers', {})
 
         url = self.api_url
         if not url.startswith(self.domain_url):
@@ -163,13 +622,128 @@ class RPC:
             url += '/' + command
         if r not in self.HTTP_METHODS:
             raise ValueError('Unsupported value for request method: %s', r)
-        req = getattr(requests, r)
         logger.debug('API request: %s -> %s', r, url)
-        req_result = req(url, *args, verify=False, **kws)  # Disable SSL verification
-        if self.raise_for_status:
-            req_result.raise_for_status()
+
+        operation = r.upper() + ' ' + _endpoint_name(command)
+        start = time.perf_counter()
+        try:
+            req_result = self._send_with_retries(r, command, url, deadline, timeout, *args, **kws)
+            if self.raise_for_status:
+                req_result.raise_for_status()
+        except Exception as e:
+            self._record(operation, start, error=e)
+            raise
+        self._record(operation, start, response=req_result, stream=kws.get('stream'))
+        return req_result
+
+    def _send_with_retries(self, r, command, url, deadline, timeout, *args, **kws):
+        deadline_at = time.monotonic() + deadline if deadline is not None else None
+        headers = kws['headers']
+        # Only GETs are safe to resend
+        attempts = 1 + (self.max_retries if r == 'get' else 0)
+        for attempt in range(attempts):
+            auth_timeout = self.timeout
+            if deadline_at is not None:
+                auth_timeout = self._cap_timeout(auth_timeout, self._remaining(deadline_at, deadline, url))
+            headers['Authorization'] = 'Bearer ' + self.get_or_renew_token(auth_timeout)
+            # Checked after the token, since a renewal may have used part of the budget
+            kws['timeout'] = timeout
+            if deadline_at is not None:
+                kws['timeout'] = self._cap_timeout(timeout, self._remaining(deadline_at, deadline, url))
+
+            try:
+                req_result = self._send(r, command, url, *args, **kws)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == attempts - 1:
+                    raise
+                logger.warning('API request %s -> %s failed (%s), retrying', r, url, e)
+            else:
+                if req_result.status_code not in self.RETRY_STATUSES or attempt == attempts - 1:
+                    break
+                logger.warning('API request %s -> %s returned %s, retrying', r, url, req_result.status_code)
+                req_result.close()
+
+            backoff = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+            if deadline_at is not None:
+                backoff = min(backoff, max(0, deadline_at - time.monotonic()))
+            time.sleep(backoff)
+
+        return req_result
+
+    def _record(self, operation, start, error=None, response=None, stream=False):
+        if self.metrics is None:
+            return
+        size = 0
+        if response is not None:
+            if stream:
+                size = int(response.headers.get('Content-Length') or 0)
+            else:
+                size = len(response.content)
+        self.metrics.record('beacon', operation, time.perf_counter() - start, bytes=size, error=error)
+
+    @staticmethod
+    def _remaining(deadline_at, deadline, url):
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            raise requests.Timeout('Deadline of {}s exceeded for {}'.format(deadline, url))
+        return remaining
+
+    @staticmethod
+    def _cap_timeout(timeout, remaining):
+        if timeout is None:
+            return remaining
+        if isinstance(timeout, tuple):
+            return tuple(remaining if part is None else min(part, remaining) for part in timeout)
+        return min(timeout, remaining)
+
+    def _hedge_delay(self, command):
+        """Latency percentile after which a duplicate request is sent, or None if hedging is off"""
+        if self.hedge_percentile is None:
+            return None
+        samples = sorted(self._latencies[_endpoint_name(command)])
+        if len(samples) < self.hedge_min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * self.hedge_percentile / 100))]
+
+    def _send(self, r, command, url, *args, **kws):
+        """Issue one HTTP request, hedged with a duplicate if it runs past the latency percentile"""
+        req = getattr(self.session, r)
+        start = time.monotonic()
+        hedge_after = self._hedge_delay(command) if r == 'get' and not kws.get('stream') else None
+
+        if hedge_after is None:
+            req_result = req(url, *args, verify=False, **kws)  # Disable SSL verification
+        else:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(max_workers=self._pool_maxsize, thread_name_prefix='beacon-hedge')
+            primary = self._hedge_executor.submit(req, url, *args, verify=False, **kws)
+            done, _ = wait([primary], timeout=hedge_after)
+            if done:
+                req_result = primary.result()
+            else:
+                logger.info('API request %s -> %s slower than %.2fs, sending hedged request', r, url, hedge_after)
+                hedge = self._hedge_executor.submit(req, url, *args, verify=False, **kws)
+                req_result = self._first_successful([primary, hedge])
+
+        self._latencies[_endpoint_name(command)].append(time.monotonic() - start)
         return req_result
 
+    @staticmethod
+    def _first_successful(futures):
+        pending = set(futures)
+        winner = None
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((f for f in done if f.exception() is None), None)
+
+        # Release the losing request's connection whenever it finishes
+        for future in futures:
+            if future is not winner:
+                future.add_done_callback(lambda f: f.exception() is None and f.result().close())
+        if winner is None:
+            return futures[0].result()
+        return winner.result()
+
     def post(self, *args, **kws):
         """Issues HTTPS POST to the default api endpoint (e.g. exec, publish, etc)
         Passes args and kws to the `requests` api
@@ -218,6 +792,139 @@ class RPC:
         """
         return self._req('delete', endpoint, *args, **kws)
 
+    @staticmethod
+    def _is_past_date(as_of) -> bool:
+        if as_of is None:
+            return False
+        if isinstance(as_of, str):
+            as_of = datetime.strptime(as_of.replace('-', ''), '%Y%m%d').date()
+        elif isinstance(as_of, datetime):
+            as_of = as_of.date()
+        return as_of < date.today()
+
+    def _cache_paths(self, key):
+        base = os.path.join(self.response_cache_dir, key)
+        return base + '.body', base + '.meta.json'
+
+    def _read_cached_response(self, key):
+        body_path, meta_path = self._cache_paths(key)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            if not meta['permanent'] and time.time() - meta['stored_at'] > self.response_cache_ttl:
+                return None
+            with open(body_path, 'rb') as f:
+                content = f.read()
+        except (OSError, ValueError, KeyError):
+            return None
+
+        try:
+            os.utime(body_path)  # Mark as recently used for LRU eviction
+        except OSError:
+            pass  # Evicted by another thread or process since the read; the content is still good
+        response = requests.Response()
+        response.status_code = meta['status_code']
+        response.headers.update(meta['headers'])
+        response.url = meta['url']
+        response.reason = 'OK'
+        response._content = content
+        response._content_consumed = True
+        return response
+
+    @staticmethod
+    def _cache_tmp_suffix():
+        return '.{}.{}.tmp'.format(os.getpid(), threading.get_ident())
+
+    @staticmethod
+    def _cache_meta(response, permanent):
+        return {
+            'status_code': response.status_code,
+            'url': response.url,
+            # Body is stored decoded, so transfer-encoding headers no longer apply
+            'headers': {k: v for k, v in response.headers.items() if k.lower() not in ('content-encoding', 'content-length', 'transfer-encoding')},
+            'stored_at': time.time(),
+            'permanent': permanent,
+        }
+
+    def _commit_cached_response(self, key, tmp_body_path, meta):
+        """Move a fully written body into place next to its metadata"""
+        body_path, meta_path = self._cache_paths(key)
+        tmp_meta_path = meta_path + self._cache_tmp_suffix()
+        with open(tmp_meta_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_body_path, body_path)
+        os.replace(tmp_meta_path, meta_path)
+        # Only the bookkeeping is serialised; bodies are written concurrently
+        with self._cache_lock:
+            self.cache_stats['stores'] += 1
+            self._evict_cached_responses()
+
+    def _store_cached_response(self, key, response, permanent):
+        tmp_body_path = self._cache_paths(key)[0] + self._cache_tmp_suffix()
+        with open(tmp_body_path, 'wb') as f:
+            f.write(response.content)
+        self._commit_cached_response(key, tmp_body_path, self._cache_meta(response, permanent))
+
+    def _tee_cached_response(self, key, response, permanent, endpoint):
+        """Cache a streamed response as the caller reads it, instead of buffering it up front"""
+        meta = self._cache_meta(response, permanent)
+
+        def on_complete(tmp_body_path):
+            try:
+                self._commit_cached_response(key, tmp_body_path, meta)
+            except OSError as e:
+                logger.warning('Could not cache response for %s: %s', endpoint, e)
+
+        response.raw = _CacheTee(response.raw, self._cache_paths(key)[0] + self._cache_tmp_suffix(), on_complete)
+
+    def _evict_cached_responses(self):
+        entries = []
+        for body_path in glob.glob(os.path.join(self.response_cache_dir, '*.body')):
+            try:
+                stat = os.stat(body_path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, body_path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, body_path in sorted(entries):
+            if total <= self.response_cache_max_bytes:
+                break
+            for path in (body_path, body_path[:-len('.body')] + '.meta.json'):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+            self.cache_stats['evictions'] += 1
+
+    def _cached_get_endpoint(self, endpoint, as_of, **kws):
+        """GET through the response cache when one is configured"""
+        if not self.response_cache_dir:
+            return self.get_endpoint(endpoint, **kws)
+
+        key = hashlib.sha256(json.dumps(
+            [self.api_url, endpoint, sorted((kws.get('params') or {}).items())], default=str
+        ).encode('utf-8')).hexdigest()
+        cached = self._read_cached_response(key)
+        with self._cache_lock:
+            self.cache_stats['hits' if cached is not None else 'misses'] += 1
+        if cached is not None:
+            logger.debug('Response cache hit: %s', endpoint)
+            return cached
+
+        response = self.get_endpoint(endpoint, **kws)
+        if response.status_code == 200:
+            permanent = self._is_past_date(as_of)
+            try:
+                if kws.get('stream') and response.raw is not None:
+                    self._tee_cached_response(key, response, permanent, endpoint)
+                else:
+                    self._store_cached_response(key, response, permanent)
+            except OSError as e:
+                logger.warning('Could not cache response for %s: %s', endpoint, e)
+        return response
+
     def post_exec(self, tasks=None, local_tasks=None, *, job_data=None):
         """Example of a wrapper around the 'exec' endpoint"""
         data = {}
@@ -231,30 +938,138 @@ class RPC:
 
     def get_rpc(self, fn_name, **kws):
         """Example of a wrapper around the 'rpc' endpoint"""
-        return self.get_endpoint('rpc/' + fn_name, params=kws)
+        return self._cached_get_endpoint('rpc/' + fn_name, kws.get('rpt_date'), params=kws)
+
+    def get_rpc_frame(self, fn_name, as_arrow=False, **kws):
+        """Calls the 'rpc' endpoint and decodes a table response (such as generate_gre) column-wise.
 
-    def post_rpc_json(self, fname, data=None):
-        """Example of send json file through HTTP POST"""
+        The response is streamed with gzip transfer encoding requested; see `decode_content_frame`.
+        Returns a pandas DataFrame, or a pyarrow Table if ``as_arrow`` is set.
+        """
+        response = self._cached_get_endpoint('rpc/' + fn_name, kws.get('rpt_date'), params=kws, stream=True,
+                                             headers={'Accept-Encoding': 'gzip, deflate'})
+        try:
+            frame = decode_content_frame(response, as_arrow=as_arrow)
+            if not response._content_consumed:
+                # The parser can stop at the closing bracket; reading the rest completes a cached copy
+                response.raw.read()
+            return frame
+        finally:
+            response.close()
+
+    def post_rpc_json(self, fname, data=None, timeout=None, deadline=None):
+        """Example of send json file through HTTP POST
+
+        Uses the client's default timeout unless one is given here.
+        """
         print('Calling: ', fname)
-        return self.post_endpoint('rpc/' + fname, data=json.dumps(data), headers={'Content-Type': 'application/json'}, timeout=600)
+        kws = {'timeout': timeout} if timeout is not None else {}
+        return self.post_endpoint('rpc/' + fname, data=json.dumps(data), headers={'Content-Type': 'application/json'},
+                                  deadline=deadline, **kws)
 
     def get_bobreports(self, batch_date, job_name, report_name):
         """Example of a wrapper around the 'bob-reports' endpoint"""
-        return self.get_endpoint('bob-reports/{}/{}/{}'.format(batch_date.strftime('%Y-%m-%d'), job_name, report_name))
+        return self._cached_get_endpoint('bob-reports/{}/{}/{}'.format(batch_date.strftime('%Y-%m-%d'), job_name, report_name), batch_date)
 
     def get_download(self, filename):
         """Example of a wrapper around the 'download' endpoint"""
         return self.get_endpoint('download/' + filename)
 
-    def post_upload(self, files, subdir, root=None):
+    def get_download_to(self, filename, path, chunk_size=1024 * 1024, resume=True, checksum=None, hash_name='sha256'):
+        """Streams the 'download' endpoint to a local file in chunks.
+
+        Data is written to ``path + '.part'`` and moved into place once complete.  With ``resume``,
+        an existing ``.part`` file from an interrupted download is continued with an HTTP Range request,
+        and a connection dropped mid-transfer is resumed up to ``max_retries`` times.
+
+        Parameters
+        ----------
+            filename : str
+                Name of the file on the 'download' endpoint
+            path : str
+                Local destination path
+            chunk_size : int
+                Bytes read from the socket and written at a time
+            resume : bool
+                Continue a previous partial download instead of starting over
+            checksum : str, optional
+                Expected hex digest of the whole file; the download is discarded and ValueError raised on mismatch
+            hash_name : str
+                `hashlib` algorithm for ``checksum``
+
+        Returns
+        -------
+            Hex digest of the downloaded file
+
+        Raises
+        ------
+            requests.HTTPError for any response other than 200 or 206, whatever ``raise_for_status`` is
+            (416 when resuming means the partial file is already complete)
+        """
+        part_path = path + '.part'
+        if not resume and os.path.exists(part_path):
+            os.remove(part_path)
+
+        for attempt in range(self.max_retries + 1):
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            # Identity encoding keeps Range offsets in terms of the bytes written to disk
+            headers = {'Accept-Encoding': 'identity'}
+            if offset:
+                headers['Range'] = 'bytes={}-'.format(offset)
+            try:
+                response = self.get_endpoint('download/' + filename, stream=True, headers=headers)
+            except requests.HTTPError as e:
+                if offset and e.response is not None and e.response.status_code == 416:
+                    break  # Nothing left to fetch: the partial file is already complete
+                raise
+
+            # Checked here too, since with raise_for_status=False an error body would be saved as the file
+            if offset and response.status_code == 416:
+                response.close()
+                break
+            if response.status_code not in (200, 206):
+                response.close()
+                raise requests.HTTPError(
+                    'Download of {} failed with status {}'.format(filename, response.status_code), response=response
+                )
+
+            with response:
+                mode = 'ab' if offset and response.status_code == 206 else 'wb'
+                try:
+                    with open(part_path, mode) as f:
+                        for chunk in response.iter_content(chunk_size=chunk_size):
+                            f.write(chunk)
+                    break
+                except (requests.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+                    if not resume or attempt == self.max_retries:
+                        raise
+                    logger.warning('Download of %s interrupted (%s), resuming', filename, e)
+
+        digest = hashlib.new(hash_name)
+        with open(part_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        if checksum is not None and digest.hexdigest().lower() != checksum.lower():
+            os.remove(part_path)
+            raise ValueError('Checksum mismatch for {}: expected {}, got {}'.format(filename, checksum, digest.hexdigest()))
+
+        os.replace(part_path, path)
+        return digest.hexdigest()
+
+    def post_upload(self, files, subdir, root=None, stream=False):
         """Example of a wrapper around the 'upload' endpoint
 
         Files should be a dict of {destination_filename: file_object}
+        With ``stream`` the multipart body is read from the (seekable) file objects block by block
+        as it is sent, instead of being assembled in memory first.
         """
-        files_info = [('upload', (name, file)) for name, file in files.items()]
         data = {'subdir': subdir}
         if root:
             data['root'] = root
+        if stream:
+            body = _MultipartStream(data, [('upload', name, file) for name, file in files.items()], uuid.uuid4().hex)
+            return self.post_endpoint('upload', data=body, headers={'Content-Type': body.content_type})
+        files_info = [('upload', (name, file)) for name, file in files.items()]
         return self.post_endpoint('upload', files=files_info, data=data)
 
     def post_publish(self, msgs, redis_name=None):
@@ -265,6 +1080,190 @@ class RPC:
         return self.post_endpoint('publish', data=json.dumps(data))
 
 
+class Publisher:
+    """Buffers messages and sends them to the 'publish' endpoint in batches from a background thread.
+
+    A batch goes out as one `RPC.post_publish` call once it holds ``max_batch`` messages or
+    ``max_bytes`` of JSON, or ``flush_interval`` seconds after its first message, whichever comes first.
+    At most ``max_queue`` messages wait to be sent; beyond that `publish` blocks (backpressure).
+    `close` (or leaving a ``with`` block) sends whatever is still buffered.  ::
+
+        with Publisher(rpc, redis_name='risk') as publisher:
+            for trader, delta in deltas.items():
+                publisher.publish({'trader': trader, 'delta': delta})
+
+    Batches that fail to send are logged and counted in ``stats``, not retried.
+    """
+
+    _STOP = object()
+    _FLUSH = object()
+    _TIMEOUT = object()
+
+    def __init__(self, rpc, redis_name=None, max_batch=500, max_bytes=256 * 1024, flush_interval=1.0, max_queue=10000):
+        self.rpc = rpc
+        self.redis_name = redis_name
+        self.max_batch = max_batch
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.stats = {'published': 0, 'batches': 0, 'failed_batches': 0, 'failed_messages': 0}
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='beacon-publisher', daemon=True)
+        self._thread.start()
+
+    def publish(self, msg, timeout=None):
+        """Queue a message, blocking while the queue is full.  Raises queue.Full if ``timeout`` runs out.
+
+        The message is serialised here, so one that isn't JSON-serialisable raises (TypeError or
+        ValueError) to the caller instead of reaching the background thread.
+        """
+        if self._closed:
+            raise RuntimeError('Publisher is closed')
+        size = len(json.dumps(msg))
+        self._queue.put((msg, size), timeout=timeout)
+
+    def flush(self):
+        """Send the pending batch now and block until every message queued so far has been sent (or failed)"""
+        if not self._closed:
+            self._queue.put(self._FLUSH)
+        self._queue.join()
+
+    def close(self):
+        """Send any buffered messages and stop the background thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(self._STOP)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _send(self, batch):
+        try:
+            self.rpc.post_publish(batch, redis_name=self.redis_name)
+            self.stats['published'] += len(batch)
+            self.stats['batches'] += 1
+        except Exception:
+            logger.exception('Failed to publish a batch of %d messages', len(batch))
+            self.stats['failed_batches'] += 1
+            self.stats['failed_messages'] += len(batch)
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def _run(self):
+        batch = []
+        batch_bytes = 0
+        flush_at = None
+        while True:
+            timeout = None if flush_at is None else max(0, flush_at - time.monotonic())
+            try:
+                msg = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                msg = self._TIMEOUT
+
+            if msg is self._STOP:
+                if batch:
+                    self._send(batch)
+                self._queue.task_done()
+                return
+
+            if msg is self._FLUSH:
+                if batch:
+                    self._send(batch)
+                    batch, batch_bytes, flush_at = [], 0, None
+                self._queue.task_done()
+                continue
+
+            if msg is not self._TIMEOUT:
+                if not batch:
+                    flush_at = time.monotonic() + self.flush_interval
+                msg, size = msg
+                batch.append(msg)
+                batch_bytes += size
+
+            if batch and (len(batch) >= self.max_batch or batch_bytes >= self.max_bytes or time.monotonic() >= flush_at):
+                self._send(batch)
+                batch, batch_bytes, flush_at = [], 0, None
+
+
+class AsyncRPC:
+    """Asyncio counterpart to `RPC` for issuing many Beacon calls concurrently.
+
+    Each call runs the blocking `RPC` method on a private thread pool of ``max_concurrency`` workers,
+    so at most that many requests are in flight and the rest queue until a worker frees up.
+    Token handling is shared with the wrapped `RPC`: its renewal is single-flight, so a burst of
+    calls at expiry still makes one auth request.  ::
+
+        async with AsyncRPC(secrets_dir=secrets_dir) as arpc:
+            today, week_ago = await asyncio.gather(
+                arpc.get_rpc('users/galaxy/jc/beacon_api/generate_gre', rpt_date='20250428'),
+                arpc.get_rpc('users/galaxy/jc/beacon_api/generate_gre', rpt_date='20250421'),
+            )
+
+    Parameters
+    ----------
+        rpc : RPC, optional
+            An existing client to wrap.  If omitted one is created from ``rpc_kws``.
+        max_concurrency : int
+            Maximum number of requests in flight at once
+        rpc_kws : optional
+            Passed to `RPC` when no client is given.  The connection pool is sized to ``max_concurrency``
+            unless ``pool_maxsize`` is given explicitly.
+    """
+
+    def __init__(self, rpc=None, max_concurrency=8, **rpc_kws):
+        if rpc is None:
+            rpc_kws.setdefault('pool_maxsize', max_concurrency)
+            rpc = RPC(**rpc_kws)
+        self.rpc = rpc
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='beacon-rpc')
+
+    async def _call(self, fn, *args, **kws):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: fn(*args, **kws))
+
+    async def get_endpoint(self, endpoint, *args, **kws):
+        """Async `RPC.get_endpoint`"""
+        return await self._call(self.rpc.get_endpoint, endpoint, *args, **kws)
+
+    async def post_endpoint(self, endpoint, *args, **kws):
+        """Async `RPC.post_endpoint`"""
+        return await self._call(self.rpc.post_endpoint, endpoint, *args, **kws)
+
+    async def get_rpc(self, fn_name, **kws):
+        """Async `RPC.get_rpc`"""
+        return await self._call(self.rpc.get_rpc, fn_name, **kws)
+
+    async def post_rpc_json(self, fname, data=None, timeout=None, deadline=None):
+        """Async `RPC.post_rpc_json`"""
+        return await self._call(self.rpc.post_rpc_json, fname, data, timeout=timeout, deadline=deadline)
+
+    async def get_bobreports(self, batch_date, job_name, report_name):
+        """Async `RPC.get_bobreports`"""
+        return await self._call(self.rpc.get_bobreports, batch_date, job_name, report_name)
+
+    async def get_download(self, filename):
+        """Async `RPC.get_download`"""
+        return await self._call(self.rpc.get_download, filename)
+
+    async def close(self):
+        """Wait for in-flight requests, then close the worker threads and the wrapped client"""
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+        self.rpc.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+
 def main():
     # Create the helper class.  With no other args, this will automatically look in ~/.beacon
     # (or %HOME%/.beacon on Windows) for client ids and tokens, and will use the default domain
@@ -0,0 +1,92 @@
+"""
+Import paths for running the tests from a checkout.
+
+The sources in src/dependencies are deployed as the ``internal_data.gre`` package, so that
+package name is pointed at them here. The other packages they import (the report models and
+config, CoinMetrics client, dotenv, Databricks connector) are replaced with minimal stand-ins
+when they are not installed; installed packages are always used as they are.
+"""
+
+import importlib.util
+import os
+import sys
+import types
+
+DEPENDENCIES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'dependencies')
+
+
+def _installed(name):
+    try:
+        return importlib.util.find_spec(name) is not None
+    except ImportError:
+        return False
+
+
+def _module(name, path=None, **attrs):
+    module = types.ModuleType(name)
+    if path is not None:
+        module.__path__ = path
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    return module
+
+
+class Trader:
+    def __init__(self, name, group):
+        self.name = name
+        self.group = group
+
+
+class Position:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class CoinMetricsClient:
+    """Replaced per test; the real client needs network access"""
+
+    def process_mapping(self, *args, **kws):
+        raise NotImplementedError
+
+    def create_aligned_dfs(self, *args, **kws):
+        raise NotImplementedError
+
+
+if not _installed('internal_data'):
+    _module('internal_data', path=[])
+    _module('internal_data.gre', path=[DEPENDENCIES_DIR])
+
+if not _installed('models'):
+    _module('models', path=[])
+    _module('models.trader', Trader=Trader)
+    _module('models.position', Position=Position)
+
+if not _installed('utils'):
+    _module('utils', path=[])
+    _module('utils.config', TRADER_MAPPING={'Novo': Trader('Novo', 'Macro')}, GRE_TRADER_MAPPING={'Beimnet': 'Beimnet A'})
+
+if not _installed('external_data'):
+    _module('external_data', path=[])
+    _module('external_data.coinmetrics', path=[])
+    _module('external_data.coinmetrics.coinmetrics_client', CoinMetricsClient=CoinMetricsClient)
+
+if not _installed('dotenv'):
+    _module('dotenv', load_dotenv=lambda *args, **kws: False)
+
+if not _installed('databricks'):
+    class Error(Exception):
+        pass
+
+    class OperationalError(Error):
+        pass
+
+    class InterfaceError(Error):
+        pass
+
+    def connect(**kws):
+        raise OperationalError('The Databricks connector is not installed')
+
+    databricks = _module('databricks', path=[])
+    databricks.sql = _module(
+        'databricks.sql', Error=Error, OperationalError=OperationalError, InterfaceError=InterfaceError, connect=connect
+    )
@@ -0,0 +1,95 @@
+"""The vectorized GREProcessor path must build the same positions as the row-wise one."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+gre = pytest.importorskip('internal_data.gre.old_gre_processor')
+
+# Underliers the stub has no prices for, so both paths see missing price data
+UNPRICED = {'DOGE', 'XYZ'}
+
+
+class StubCoinMetrics:
+    """Deterministic prices and returns for every requested underlier except UNPRICED"""
+
+    def __init__(self, *args, **kws):
+        pass
+
+    def process_mapping(self, mapping_file_path, underliers, end_date=None, **kws):
+        return sorted(u for u in underliers if u not in UNPRICED)
+
+    def create_aligned_dfs(self, underliers):
+        rng = np.random.default_rng(0)
+        index = pd.date_range('2024-01-01', periods=30)[::-1]
+        prices = pd.DataFrame(rng.random((30, len(underliers))) * 100, index=index, columns=underliers)
+        returns = pd.DataFrame(rng.normal(0, 0.02, (30, len(underliers))), index=index, columns=underliers)
+        return prices, returns
+
+
+def gre_positions(n=400, seed=1):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Pod(L2)': rng.choice(['Novo', 'Beimnet', 'Bouchra', 'Felman', 'CryptoHedges', 'Other'], n),
+        'Book(L3)': rng.choice(['Crypto', 'Crypto', 'Crypto', 'Rates'], n),
+        'Business(L0)': rng.choice(['PrincipalTrading', 'PrincipalTrading', 'Other'], n),
+        'Strategy(L4)': rng.choice(['S1', 'S2'], n),
+        'PositionBlock(L5)': rng.choice(['B1', np.nan], n),
+        'Underlier': rng.choice(['BTC', 'IBIT', 'ETH', 'QETH', 'SOL', 'FTX_SOL', 'DOGE', 'LOCKED_ENA',
+                                 'XYZ', 'GBTC', 'BTC_FUND', 'NONCPO_SOL', 'BGCI'], n),
+        'Ticker': rng.choice(['BTC', 'IBIT', 'ETH', 'BTCUSD-2025FEB28-C-110000=GALAXY_HK',
+                              'ETHUSD-2025MAR28-P-3000=X', 'SOLX', 'DOGE', 'BAD-TICK', 'WBTC'], n),
+        'Type': rng.choice(['CryptoOption', 'Spot', 'Future'], n),
+        '$Delta': np.where(rng.random(n) < 0.1, 0.0, rng.normal(0, 1e5, n)),
+        '$Gamma': rng.normal(size=n),
+        '$Vega': rng.normal(size=n),
+        '$Theta': rng.normal(size=n),
+        '%Delta': rng.random(n),
+        'Quantity': rng.normal(0, 10, n),
+        'Price': rng.random(n) * 1000,
+        'Value': rng.normal(size=n),
+        'Expiry': pd.to_datetime(rng.choice(['2025-01-01', None], n)),
+    })
+
+
+@pytest.fixture
+def make_processor(monkeypatch, tmp_path):
+    monkeypatch.setenv('SECRETS_DIR', str(tmp_path))
+    monkeypatch.delenv('PRICE_STORE_DIR', raising=False)
+    monkeypatch.setattr(gre, 'CoinMetricsClient', StubCoinMetrics)
+    return lambda: gre.GREProcessor('mapping.csv', data_source='databricks', as_of_date='2024-01-30')
+
+
+def assert_same_value(field, expected, actual):
+    if isinstance(expected, np.ndarray):
+        assert np.array_equal(expected, actual), field
+    elif expected is None:
+        assert actual is None, field
+    elif pd.isna(expected):
+        assert pd.isna(actual) and type(actual) is type(expected), field
+    else:
+        assert actual == expected, field
+
+
+def test_vectorized_matches_row_wise(make_processor):
+    data = gre_positions()
+    row_wise, row_wise_missing = make_processor().process_data(data)
+    vectorized, vectorized_missing = make_processor().process_data(data, vectorized=True)
+
+    assert len(row_wise) > 50
+    assert len(vectorized) == len(row_wise)
+    assert sorted(vectorized_missing) == sorted(row_wise_missing)
+    for expected, actual in zip(row_wise, vectorized):
+        expected_fields, actual_fields = vars(expected), vars(actual)
+        assert actual_fields.keys() == expected_fields.keys()
+        for field, value in expected_fields.items():
+            if field == 'trader':
+                assert vars(actual_fields[field]) == vars(value)
+            else:
+                assert_same_value(field, value, actual_fields[field])
+
+
+@pytest.mark.parametrize('data', [pd.DataFrame(), gre_positions().iloc[:0]], ids=['no_columns', 'no_rows'])
+def test_empty_input(make_processor, data):
+    assert make_processor().process_data(data) == ([], [])
+    assert make_processor().process_data(data, vectorized=True) == ([], [])